@@ -0,0 +1,88 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(".photo_cache/analysis.sqlite")
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_params_key(params):
+    """Stable string form of analyzer parameters (tuples and lists hash the same)"""
+    return json.dumps(params or {}, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class AnalysisCache:
+    """
+    Persistent analyzer results keyed by (content hash, analyzer name, parameters).
+
+    Keying by file content instead of the photo title means a renamed file keeps
+    its results, and a file whose pixels changed under the same name is re-analyzed.
+    Safe to share between threads; each process opens its own connection.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " content_hash TEXT NOT NULL,"
+            " analyzer TEXT NOT NULL,"
+            " params TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (content_hash, analyzer, params))"
+        )
+        self._conn.commit()
+
+    def get(self, content_hash, analyzer, params=None):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE content_hash = ? AND analyzer = ? AND params = ?",
+                (content_hash, analyzer, make_params_key(params)),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, content_hash, analyzer, params, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (content_hash, analyzer, params, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (content_hash, analyzer, make_params_key(params), json.dumps(value), time.time()),
+            )
+            self._conn.commit()
+
+    def get_or_compute(self, content_hash, analyzer, params, compute):
+        """Return the cached value or run compute() and store its result.
+
+        Exceptions from compute() propagate and nothing is cached, so a failed
+        analysis is retried on the next run.
+        """
+        value = self.get(content_hash, analyzer, params)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(content_hash, analyzer, params, value)
+        return value, False
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,62 +1,126 @@
 import cv2
 import numpy as np
 from collections import Counter
-from sklearn.cluster import KMeans
-import colorsys
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from PIL import Image
 
-def analyze_color_by_sections(image_path, grid_size=(3, 3), colors_per_section=3, min_percentage=2.0):
+from photo_frame import draft_scale
+
+# The image is analyzed at no more than this size (width, height)
+MAX_ANALYSIS_SIZE = (800, 600)
+# cv2.imread flags that decode a JPEG at 1/2, 1/4 or 1/8 scale
+REDUCED_READ_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                      4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+FAMILIAR_COLORS = {
+    'red': (255, 0, 0),
+    'orange': (255, 165, 0),
+    'yellow': (255, 255, 0),
+    'green': (0, 255, 0),
+    'blue': (0, 0, 255),
+    'sky_blue': (135, 206, 235),
+    'purple': (128, 0, 128),
+    'pink': (255, 192, 203),
+    'brown': (139, 69, 19),
+    'black': (0, 0, 0),
+    'white': (255, 255, 255),
+    # 'snow_white': (255, 250, 250)
+    'gray': (128, 128, 128),
+    'bright_gray': (192, 192, 192),
+    'navy': (0, 0, 128),
+    'olive': (128, 128, 0),
+    'gold': (255, 215, 0),
+    'beige': (245, 245, 220),
+    'lime': (0, 255, 0),
+    # 'silver': (192, 192, 192),
+    # 'teal': (0, 128, 128),
+    # 'maroon': (128, 0, 0),
+    # 'turquoise': (64, 224, 208),
+    # 'forest_green': (34, 139, 34),
+}
+
+
+def _rgb_to_hsv(rgb):
+    """Vectorized colorsys.rgb_to_hsv for an (N, 3) array of 0-255 RGB values"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    maxc = rgb.max(axis=1)
+    minc = rgb.min(axis=1)
+    rangec = maxc - minc
+    gray = rangec == 0
+    safe_range = np.where(gray, 1.0, rangec)
+    safe_max = np.where(maxc == 0, 1.0, maxc)
+    
+    s = np.where(gray, 0.0, rangec / safe_max)
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+    return np.stack([h, s, maxc], axis=1)
+
+
+def _palette_arrays(familiar_colors):
+    names = list(familiar_colors)
+    rgb = np.array([familiar_colors[name] for name in names], dtype=np.float64)
+    return names, rgb, _rgb_to_hsv(rgb)
+
+
+# Palette precomputed once in RGB and HSV
+_PALETTE_NAMES, _PALETTE_RGB, _PALETTE_HSV = _palette_arrays(FAMILIAR_COLORS)
+
+QUANTIZATION_METHODS = ('kmeans', 'minibatch', 'histogram', 'global')
+
+# Pixels sampled to fit MiniBatchKMeans, per section ('minibatch') or per image ('global')
+MINIBATCH_SAMPLE_SIZE = 4000
+GLOBAL_CLUSTERS = 12
+HISTOGRAM_BINS_PER_CHANNEL = 8
+
+
+def analyze_color_by_sections(image_path, grid_size=(3, 3), colors_per_section=3, min_percentage=2.0, image=None,
+                              method='kmeans'):
     """
     Analyze color by dividing image into grid sections and analyzing each separately.
+    Colors are named from FAMILIAR_COLORS.
     
     Args:
         image_path (str): Path to the image file
         grid_size (tuple): Grid dimensions (rows, cols) for sectioning
         colors_per_section (int): Max colors to extract per section
         min_percentage (float): Minimum percentage for a color to be included globally
+        image (np.array): Already decoded RGB image; skips reading image_path
+        method (str): Color quantization backend
+            - 'kmeans': KMeans(n_init=10) per section (reference, slowest)
+            - 'minibatch': MiniBatchKMeans fit on a pixel subsample per section
+            - 'histogram': peaks of a fixed-bin 3D color histogram per section
+            - 'global': one MiniBatchKMeans over the whole image, labels reused per section
     
     Returns:
         list: Set of dominant color tags from all sections
     """
     
-    FAMILIAR_COLORS = {
-        'red': (255, 0, 0),
-        'orange': (255, 165, 0),
-        'yellow': (255, 255, 0),
-        'green': (0, 255, 0),
-        'blue': (0, 0, 255),
-        'sky_blue': (135, 206, 235),
-        'purple': (128, 0, 128),
-        'pink': (255, 192, 203),
-        'brown': (139, 69, 19),
-        'black': (0, 0, 0),
-        'white': (255, 255, 255),
-        # 'snow_white': (255, 250, 250)
-        'gray': (128, 128, 128),
-        'bright_gray': (192, 192, 192),
-        'navy': (0, 0, 128),
-        'olive': (128, 128, 0),
-        'gold': (255, 215, 0),
-        'beige': (245, 245, 220),
-        'lime': (0, 255, 0),
-        # 'silver': (192, 192, 192),
-        # 'teal': (0, 128, 128),
-        # 'maroon': (128, 0, 0),
-        # 'turquoise': (64, 224, 208),
-        # 'forest_green': (34, 139, 34),
-    }
+    if method not in QUANTIZATION_METHODS:
+        raise ValueError(f"Invalid method '{method}'. Choose from: {list(QUANTIZATION_METHODS)}")
     
     try:
         # Load and preprocess image
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Could not load image from {image_path}")
-        
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        if image is not None:
+            image_rgb = image
+        else:
+            # Only the header is read here; decode at the smallest scale that still covers MAX_ANALYSIS_SIZE
+            with Image.open(image_path) as img:
+                scale = draft_scale(img.size, *MAX_ANALYSIS_SIZE)
+            image = cv2.imread(str(image_path), REDUCED_READ_FLAGS[scale])
+            if image is None:
+                raise ValueError(f"Could not load image from {image_path}")
+            
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
         # Resize if too large
         height, width = image_rgb.shape[:2]
-        if width > 800 or height > 600:
-            scale = min(800/width, 600/height)
+        max_width, max_height = MAX_ANALYSIS_SIZE
+        if width > max_width or height > max_height:
+            scale = min(max_width/width, max_height/height)
             new_width = int(width * scale)
             new_height = int(height * scale)
             image_rgb = cv2.resize(image_rgb, (new_width, new_height))
@@ -70,6 +134,12 @@ def analyze_color_by_sections(image_path, grid_size=(3, 3), colors_per_section=3
         all_section_colors = []
         color_frequency = Counter()
         
+        # Quantize the whole image once; each section then only counts labels
+        label_map = global_centers = None
+        if method == 'global':
+            global_centers, global_labels = _minibatch_quantize(image_rgb.reshape(-1, 3), GLOBAL_CLUSTERS)
+            label_map = global_labels.reshape(height, width)
+        
         # Analyze each section
         for row in range(rows):
             for col in range(cols):
@@ -82,7 +152,9 @@ def analyze_color_by_sections(image_path, grid_size=(3, 3), colors_per_section=3
                 section = image_rgb[y_start:y_end, x_start:x_end]
                 
                 # Analyze section colors
-                section_colors = analyze_section_colors(section, FAMILIAR_COLORS, colors_per_section)
+                section_labels = label_map[y_start:y_end, x_start:x_end] if label_map is not None else None
+                section_colors = analyze_section_colors(section, FAMILIAR_COLORS, colors_per_section, method=method,
+                                                        labels=section_labels, centers=global_centers)
                 
                 # Weight by section size (larger sections contribute more)
                 section_size = (y_end - y_start) * (x_end - x_start)
@@ -109,7 +181,7 @@ def analyze_color_by_sections(image_path, grid_size=(3, 3), colors_per_section=3
         return None
 
 
-def analyze_section_colors(section, familiar_colors, max_colors=3):
+def analyze_section_colors(section, familiar_colors, max_colors=3, method='kmeans', labels=None, centers=None):
     """
     Analyze colors in a single image section.
     
@@ -117,6 +189,9 @@ def analyze_section_colors(section, familiar_colors, max_colors=3):
         section (np.array): Image section as numpy array
         familiar_colors (dict): Color mapping dictionary
         max_colors (int): Maximum colors to extract from this section
+        method (str): Quantization backend, see analyze_color_by_sections
+        labels (np.array): Per-pixel labels from a global quantization ('global' only)
+        centers (np.array): Cluster centers those labels refer to ('global' only)
     
     Returns:
         list: List of color information dictionaries
@@ -132,6 +207,8 @@ def analyze_section_colors(section, familiar_colors, max_colors=3):
     mask = np.sum(pixels, axis=1) > 10  # Only remove near-pure black
     if np.sum(mask) > len(pixels) * 0.1:
         pixels = pixels[mask]
+        if labels is not None:
+            labels = labels.reshape(-1)[mask]
     
     if len(pixels) < 50:  # Skip sections with too few pixels
         return []
@@ -141,16 +218,34 @@ def analyze_section_colors(section, familiar_colors, max_colors=3):
     if n_clusters < 1:
         return []
     
-    # K-means clustering
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    kmeans.fit(pixels)
-    
-    colors = kmeans.cluster_centers_.astype(int)
-    labels = kmeans.labels_
+    if labels is not None:
+        # Keep the section's n_clusters most common global clusters
+        labels = labels.reshape(-1)
+        global_counts = np.bincount(labels, minlength=len(centers))
+        top = np.argsort(-global_counts, kind='stable')[:n_clusters]
+        top = top[global_counts[top] > 0]
+        colors = centers[top].astype(int)
+        color_counts = dict(enumerate(global_counts[top]))
+        total_pixels = len(labels)
+    else:
+        if method == 'kmeans':
+            # K-means clustering
+            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+            kmeans.fit(pixels)
+            colors, labels = kmeans.cluster_centers_, kmeans.labels_
+        elif method == 'minibatch':
+            colors, labels = _minibatch_quantize(pixels, n_clusters)
+        else:
+            colors, labels = _histogram_quantize(pixels, n_clusters)
+        
+        colors = colors.astype(int)
+        
+        # Calculate percentages
+        color_counts = Counter(labels)
+        total_pixels = len(labels)
     
-    # Calculate percentages
-    color_counts = Counter(labels)
-    total_pixels = len(labels)
+    # Name all cluster centers in one vectorized pass
+    familiar_names = map_to_familiar_colors(colors, familiar_colors)
     
     section_colors = []
     for i, color in enumerate(colors):
@@ -158,7 +253,7 @@ def analyze_section_colors(section, familiar_colors, max_colors=3):
         
         # Lower threshold for section-level analysis
         if percentage >= 10.0:  # 10% within the section
-            familiar_color = map_to_familiar_color(tuple(color), familiar_colors)
+            familiar_color = familiar_names[i]
             section_colors.append({
                 'rgb': tuple(color),
                 'percentage': percentage,
@@ -168,41 +263,90 @@ def analyze_section_colors(section, familiar_colors, max_colors=3):
     return section_colors
 
 
-def map_to_familiar_color(rgb_color, familiar_colors):
+def _minibatch_quantize(pixels, n_clusters):
+    """MiniBatchKMeans fit on a random subsample; every pixel is then labeled with predict()"""
+    pixels = np.asarray(pixels, dtype=np.float32)
+    sample = pixels
+    if len(pixels) > MINIBATCH_SAMPLE_SIZE:
+        rng = np.random.default_rng(42)
+        sample = pixels[rng.choice(len(pixels), MINIBATCH_SAMPLE_SIZE, replace=False)]
+    n_clusters = min(n_clusters, len(sample))
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3, batch_size=1024)
+    kmeans.fit(sample)
+    return kmeans.cluster_centers_, kmeans.predict(pixels)
+
+
+def _histogram_quantize(pixels, n_clusters):
     """
-    Improved color mapping using perceptual distance.
+    Seed clusters from the most populated bins of a fixed-bin 3D color histogram.
+    
+    Each seed is the mean color of its bin, and every pixel is assigned to the
+    nearest seed, so percentages cover the whole section like k-means labels do.
     """
-    min_distance = float('inf')
-    closest_color = 'unknown'
+    pixels = np.asarray(pixels)
+    shift = 8 - int(np.log2(HISTOGRAM_BINS_PER_CHANNEL))
+    bits = 8 - shift
+    q = (pixels >> shift).astype(np.int32)
+    bin_ids = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+    n_bins = HISTOGRAM_BINS_PER_CHANNEL ** 3
     
-    # Convert to HSV for better perceptual matching
-    r, g, b = [x/255.0 for x in rgb_color]
-    h1, s1, v1 = colorsys.rgb_to_hsv(r, g, b)
+    counts = np.bincount(bin_ids, minlength=n_bins)
+    top = np.argsort(-counts, kind='stable')[:n_clusters]
+    top = top[counts[top] > 0]
     
-    for color_name, color_rgb in familiar_colors.items():
-        # Calculate both RGB and HSV distances
-        rgb_distance = np.sqrt(sum((a - b) ** 2 for a, b in zip(rgb_color, color_rgb)))
-        
-        # HSV distance (weighted toward hue and saturation)
-        r2, g2, b2 = [x/255.0 for x in color_rgb]
-        h2, s2, v2 = colorsys.rgb_to_hsv(r2, g2, b2)
-        
-        # Hue distance (circular)
-        hue_diff = min(abs(h1 - h2), 1 - abs(h1 - h2))
-        hsv_distance = np.sqrt(
-            (hue_diff * 2) ** 2 +  # Weight hue more heavily
-            (s1 - s2) ** 2 +
-            (v1 - v2) ** 2
-        )
-        
-        # Combine distances
-        combined_distance = rgb_distance * 0.3 + hsv_distance * 100 * 0.7
-        
-        if combined_distance < min_distance:
-            min_distance = combined_distance
-            closest_color = color_name
+    sums = np.stack([np.bincount(bin_ids, weights=pixels[:, c], minlength=n_bins) for c in range(3)], axis=1)
+    centers = sums[top] / counts[top][:, None]
+    
+    distances = ((pixels[:, None, :].astype(np.float32) - centers[None, :, :].astype(np.float32)) ** 2).sum(axis=2)
+    return centers, distances.argmin(axis=1)
+
+
+def map_to_familiar_colors(rgb_colors, familiar_colors=None):
+    """
+    Map an (N, 3) array of RGB colors to familiar color names in one vectorized pass.
+    
+    Uses the same perceptual distance as map_to_familiar_color: 0.3 * RGB euclidean
+    distance + 70 * HSV distance (hue weighted double, circular).
+    
+    Args:
+        rgb_colors (np.array): (N, 3) RGB values in 0-255
+        familiar_colors (dict): Color mapping dictionary (default: FAMILIAR_COLORS)
     
-    return closest_color
+    Returns:
+        list: N color names
+    """
+    if familiar_colors is None or familiar_colors is FAMILIAR_COLORS:
+        names, palette_rgb, palette_hsv = _PALETTE_NAMES, _PALETTE_RGB, _PALETTE_HSV
+    else:
+        names, palette_rgb, palette_hsv = _palette_arrays(familiar_colors)
+    
+    rgb = np.asarray(rgb_colors, dtype=np.float64).reshape(-1, 3)
+    if len(rgb) == 0:
+        return []
+    hsv = _rgb_to_hsv(rgb)
+    
+    # (N, palette) distance matrices
+    rgb_distance = np.sqrt(((rgb[:, None, :] - palette_rgb[None, :, :]) ** 2).sum(axis=2))
+    
+    hue_diff = np.abs(hsv[:, None, 0] - palette_hsv[None, :, 0])
+    hue_diff = np.minimum(hue_diff, 1 - hue_diff)
+    hsv_distance = np.sqrt(
+        (hue_diff * 2) ** 2 +  # Weight hue more heavily
+        (hsv[:, None, 1] - palette_hsv[None, :, 1]) ** 2 +
+        (hsv[:, None, 2] - palette_hsv[None, :, 2]) ** 2
+    )
+    
+    combined_distance = rgb_distance * 0.3 + hsv_distance * 100 * 0.7
+    
+    # argmin keeps the first of equal distances, like the original loop
+    return [names[i] for i in combined_distance.argmin(axis=1)]
+
+
+def map_to_familiar_color(rgb_color, familiar_colors=None):
+    """
+    Improved color mapping using perceptual distance.
+    """
+    return map_to_familiar_colors([rgb_color], familiar_colors)[0]
 
 
 # Alternative: Semantic sectioning based on image content
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Compare color quantization backends of analyze_color_by_sections.
+
+Reports time per image for each method and how well its color tags agree with
+the reference per-section KMeans ('kmeans'): mean Jaccard similarity of the tag
+sets, exact tag-set matches and top-1 tag matches.
+
+Usage:
+    python benchmark_color_quantization.py <photo_dir> [--limit 50] [--methods kmeans minibatch histogram global]
+
+Example:
+    python benchmark_color_quantization.py assets/img/photos_optimized --limit 30
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import cv2
+
+from analyze_color import analyze_color_by_sections, QUANTIZATION_METHODS
+
+
+def load_images(photo_dir, limit):
+    image_extensions = {'.jpg', '.jpeg', '.png'}
+    paths = sorted(f for f in Path(photo_dir).rglob("*") if f.is_file() and f.suffix.lower() in image_extensions)
+    images = []
+    for path in paths[:limit]:
+        image = cv2.imread(str(path))
+        if image is not None:
+            images.append((path, cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark color quantization backends')
+    parser.add_argument('photo_dir', help='Directory of photos (searched recursively)')
+    parser.add_argument('--limit', type=int, default=50, help='Max images to use (default: 50)')
+    parser.add_argument('--methods', nargs='+', default=list(QUANTIZATION_METHODS), choices=QUANTIZATION_METHODS)
+    args = parser.parse_args()
+
+    # Decode up front so only quantization is timed
+    images = load_images(args.photo_dir, args.limit)
+    if not images:
+        print(f"No images found in {args.photo_dir}")
+        return
+    print(f"Benchmarking {len(images)} images from {args.photo_dir}\n")
+
+    methods = args.methods if 'kmeans' in args.methods else ['kmeans'] + args.methods
+    tags = {}
+    seconds = {}
+    for method in methods:
+        tags[method] = []
+        ts = time.perf_counter()
+        for path, image in images:
+            tags[method].append(analyze_color_by_sections(path, image=image, method=method) or [])
+        seconds[method] = time.perf_counter() - ts
+
+    reference = tags['kmeans']
+    print(f"{'method':<10} {'ms/image':>9} {'speedup':>8} {'jaccard':>8} {'exact':>7} {'top-1':>7}")
+    for method in methods:
+        jaccard = exact = top1 = 0
+        for ref, got in zip(reference, tags[method]):
+            union = set(ref) | set(got)
+            jaccard += len(set(ref) & set(got)) / len(union) if union else 1.0
+            exact += set(ref) == set(got)
+            top1 += ref[:1] == got[:1]
+        n = len(images)
+        ms = seconds[method] / n * 1000
+        print(f"{method:<10} {ms:>9.1f} {seconds['kmeans'] / seconds[method]:>7.1f}x "
+              f"{jaccard / n:>8.3f} {exact / n:>7.1%} {top1 / n:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
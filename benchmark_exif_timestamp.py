@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare the EXIF timestamp fast path against the PIL tag scan.
+
+For every photo under a directory, times extract_timestamp with fast=True (read
+only the EXIF segment, look tags up by ID) and fast=False (open with PIL and
+scan every tag), and counts how often the two agree. They can legitimately
+differ when a photo was edited: the fast path prefers DateTimeOriginal from the
+Exif sub-IFD, while the tag scan only sees IFD0 and reports DateTime.
+
+Usage:
+    python benchmark_exif_timestamp.py <photo_dir> [--limit 500] [--repeat 3]
+
+Example:
+    python benchmark_exif_timestamp.py assets/img/photos
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from get_time_photo_taken import extract_timestamp
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark EXIF timestamp extraction')
+    parser.add_argument('photo_dir', help='Directory of photos (searched recursively)')
+    parser.add_argument('--limit', type=int, default=500, help='Max photos to use (default: 500)')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes per method; the fastest is kept (default: 3)')
+    args = parser.parse_args()
+
+    image_extensions = {'.jpg', '.jpeg', '.png'}
+    paths = sorted(f for f in Path(args.photo_dir).rglob("*") if f.is_file() and f.suffix.lower() in image_extensions)
+    paths = paths[:args.limit]
+    if not paths:
+        print(f"No images found in {args.photo_dir}")
+        return
+    print(f"Benchmarking {len(paths)} photos from {args.photo_dir}\n")
+
+    results = {}
+    seconds = {}
+    for name, fast in [('tag scan', False), ('fast path', True)]:
+        best = None
+        for _ in range(args.repeat):
+            ts = time.perf_counter()
+            results[name] = [extract_timestamp(path, fast=fast) for path in paths]
+            elapsed = time.perf_counter() - ts
+            best = elapsed if best is None else min(best, elapsed)
+        seconds[name] = best
+
+    def as_str(value):
+        # extract_timestamp returns a dict for files without EXIF
+        return value if isinstance(value, str) else None
+
+    found = sum(as_str(value) is not None for value in results['fast path'])
+    same = sum(as_str(a) == as_str(b) for a, b in zip(results['tag scan'], results['fast path']))
+    print(f"{'method':<10} {'µs/photo':>9} {'speedup':>8}")
+    for name in ['tag scan', 'fast path']:
+        print(f"{name:<10} {seconds[name] / len(paths) * 1e6:>9.1f} {seconds['tag scan'] / seconds[name]:>7.1f}x")
+    print(f"\nTimestamps found: {found}/{len(paths)}, same result from both methods: {same}/{len(paths)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare YOLO throughput at different batch sizes on CPU.
+
+Images are decoded up front and a warm-up pass loads the model, so only
+inference is timed. For each batch size this prints images/sec, the speedup
+over batch size 1 and how many images got the same set of classes as batch
+size 1 (letterboxing a batch pads every image to the same square, so boxes
+near the threshold can differ slightly).
+
+Usage:
+    python benchmark_object_detection_batch.py <photo_dir> [--model-size l] [--limit 32] [--batch-sizes 1 4 8 16]
+
+Example:
+    python benchmark_object_detection_batch.py assets/img/photos_optimized --model-size n
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from object_detection import detect_objects_batch, load_yolo_model_once
+
+
+def load_images(photo_dir, limit):
+    image_extensions = {'.jpg', '.jpeg', '.png'}
+    paths = sorted(f for f in Path(photo_dir).rglob("*") if f.is_file() and f.suffix.lower() in image_extensions)
+    images = []
+    for path in paths[:limit]:
+        with Image.open(path) as img:
+            images.append(ImageOps.exif_transpose(img).convert('RGB'))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batched YOLO inference')
+    parser.add_argument('photo_dir', help='Directory of photos (searched recursively)')
+    parser.add_argument('--model-size', default='l', choices=['n', 's', 'm', 'l', 'x'])
+    parser.add_argument('--image-size', type=int, default=640)
+    parser.add_argument('--limit', type=int, default=32, help='Max images to use (default: 32)')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    images = load_images(args.photo_dir, args.limit)
+    if not images:
+        print(f"No images found in {args.photo_dir}")
+        return
+    print(f"Benchmarking {len(images)} images from {args.photo_dir} with yolo11{args.model_size}\n")
+
+    load_yolo_model_once(args.model_size)
+    detect_objects_batch(images[:1], args.model_size, args.image_size, batch=1)  # Warm-up
+
+    batch_sizes = args.batch_sizes if 1 in args.batch_sizes else [1] + args.batch_sizes
+    results = {}
+    seconds = {}
+    for batch in batch_sizes:
+        ts = time.perf_counter()
+        results[batch] = detect_objects_batch(images, args.model_size, args.image_size, batch=batch)
+        seconds[batch] = time.perf_counter() - ts
+
+    reference = results[1]
+    print(f"{'batch':>5} {'images/s':>9} {'speedup':>8} {'same classes':>13}")
+    for batch in batch_sizes:
+        same = sum(set(ref or []) == set(got or []) for ref, got in zip(reference, results[batch]))
+        print(f"{batch:>5} {len(images) / seconds[batch]:>9.2f} {seconds[1] / seconds[batch]:>7.2f}x "
+              f"{same:>6}/{len(images)}")
+
+
+if __name__ == "__main__":
+    main()
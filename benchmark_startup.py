@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Guard the cold-start cost of the photo scripts' optimize-only path.
+
+Imports each entry module in a fresh interpreter under `python -X importtime`,
+several times, and reports the median import time, wall time and peak RSS, plus
+the slowest imports. Fails (exit 1) if a heavy analyzer dependency (torch,
+ultralytics, transformers, clip, sklearn, cv2, numpy) is imported at startup, or
+if the median import time is over --max-ms. Those modules should only be
+imported once the analyzer that needs them is enabled.
+
+Usage:
+    python benchmark_startup.py [--modules generate_photos_md_parallelized generate_photos_md] [--runs 5] [--max-ms 300]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ['torch', 'ultralytics', 'transformers', 'clip', 'sklearn', 'cv2', 'numpy']
+
+
+def import_once(module):
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        tuple: (import µs of module, wall seconds, peak RSS in MB, {imported module: cumulative µs})
+    """
+    ts = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    stderr = process.stderr.read()
+    _, status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - ts
+    if process.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{stderr}")
+
+    imports = {}
+    for line in stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports[name.strip()] = int(cumulative)
+    # ru_maxrss is in KB on Linux
+    return imports.get(module, 0), wall, rusage.ru_maxrss / 1024, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure and guard import time of the photo scripts')
+    parser.add_argument('--modules', nargs='+', default=['generate_photos_md_parallelized', 'generate_photos_md'])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters per module (default: 5)')
+    parser.add_argument('--max-ms', type=float, default=300, help='Budget for the median import time (default: 300)')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list (default: 10)')
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        runs = [import_once(module) for _ in range(args.runs)]
+        import_ms = statistics.median(run[0] for run in runs) / 1000
+        wall_ms = statistics.median(run[1] for run in runs) * 1000
+        rss_mb = max(run[2] for run in runs)
+        imports = runs[-1][3]
+
+        heavy = sorted(name for name in imports if name.split('.')[0] in HEAVY_MODULES and '.' not in name)
+        over_budget = import_ms > args.max_ms
+        failed |= bool(heavy) or over_budget
+
+        print(f"{module}: import {import_ms:.0f}ms, wall {wall_ms:.0f}ms, peak RSS {rss_mb:.0f}MB "
+              f"(median of {args.runs}){'  OVER BUDGET' if over_budget else ''}")
+        for name, cumulative in sorted(imports.items(), key=lambda item: -item[1])[1:args.top + 1]:
+            print(f"    {cumulative / 1000:>8.1f}ms  {name}")
+        if heavy:
+            print(f"    FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        print()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Check that the exported YOLO backends agree with the PyTorch reference.
+
+Runs every image through the 'torch' backend and each backend under test, and
+compares the set of classes detected at or above the confidence threshold. A
+backend passes when at least --min-agreement of the images get the same class
+set. Also reports ms/image per backend. Exits non-zero if any backend fails.
+
+Usage:
+    python check_yolo_backend_parity.py <photo_dir> [--model-size l] [--backends onnx openvino] [--conf 0.25]
+
+Example:
+    python check_yolo_backend_parity.py assets/img/photos_optimized --model-size n --limit 20
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from object_detection import BACKENDS, load_yolo_model_once
+
+
+def load_images(photo_dir, limit):
+    image_extensions = {'.jpg', '.jpeg', '.png'}
+    paths = sorted(f for f in Path(photo_dir).rglob("*") if f.is_file() and f.suffix.lower() in image_extensions)
+    images = []
+    for path in paths[:limit]:
+        with Image.open(path) as img:
+            images.append((path, ImageOps.exif_transpose(img).convert('RGB')))
+    return images
+
+
+def detect_classes(model, images, image_size, conf):
+    """Set of class names at or above conf for each image, and the total seconds spent"""
+    classes = []
+    ts = time.perf_counter()
+    for _, image in images:
+        result = model(image, imgsz=image_size, conf=conf, verbose=False)[0]
+        classes.append({result.names[int(box.cls[0])] for box in result.boxes})
+    return classes, time.perf_counter() - ts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare YOLO backends against the PyTorch reference')
+    parser.add_argument('photo_dir', help='Directory of photos (searched recursively)')
+    parser.add_argument('--model-size', default='l', choices=['n', 's', 'm', 'l', 'x'])
+    parser.add_argument('--image-size', type=int, default=640)
+    parser.add_argument('--backends', nargs='+', default=['onnx'], choices=[b for b in BACKENDS if b != 'torch'])
+    parser.add_argument('--conf', type=float, default=0.25, help='Confidence threshold (default: 0.25)')
+    parser.add_argument('--min-agreement', type=float, default=0.95,
+                        help='Fraction of images whose class sets must match (default: 0.95)')
+    parser.add_argument('--limit', type=int, default=50, help='Max images to use (default: 50)')
+    args = parser.parse_args()
+
+    images = load_images(args.photo_dir, args.limit)
+    if not images:
+        print(f"No images found in {args.photo_dir}")
+        sys.exit(1)
+    print(f"Checking {len(images)} images from {args.photo_dir} with yolo11{args.model_size} at conf >= {args.conf}\n")
+
+    results = {}
+    seconds = {}
+    for backend in ['torch'] + args.backends:
+        model = load_yolo_model_once(args.model_size, backend)
+        model(images[0][1], imgsz=args.image_size, verbose=False)  # Warm-up
+        results[backend], seconds[backend] = detect_classes(model, images, args.image_size, args.conf)
+
+    reference = results['torch']
+    failed = False
+    print(f"{'backend':<14} {'ms/image':>9} {'speedup':>8} {'agreement':>10}")
+    for backend in ['torch'] + args.backends:
+        matches = sum(ref == got for ref, got in zip(reference, results[backend]))
+        agreement = matches / len(images)
+        ok = agreement >= args.min_agreement
+        failed |= not ok
+        print(f"{backend:<14} {seconds[backend] / len(images) * 1000:>9.1f} "
+              f"{seconds['torch'] / seconds[backend]:>7.2f}x {agreement:>10.1%}{'' if ok else '  FAIL'}")
+        for (path, _), ref, got in zip(images, reference, results[backend]):
+            if ref != got:
+                print(f"    {path.name}: torch {sorted(ref)} vs {backend} {sorted(got)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
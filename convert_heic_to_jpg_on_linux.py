@@ -5,18 +5,40 @@ Converts all HEIC files in a target directory to JPG format.
 Works on macOS (using sips) and Linux (using pillow-heif).
 
 Usage:
-    python convert_heic_cross_platform.py <target_directory>
+    python convert_heic_cross_platform.py <target_directory> [--jobs=N] [--recursive]
     
 Example:
     python convert_heic_cross_platform.py assets/img/photos
+    python convert_heic_cross_platform.py assets/img/photos --jobs=8 --recursive
+
+Each JPG is written to a temp file and renamed into place, and every finished
+conversion is recorded in <target_directory>/.heic_conversions.json, so an
+interrupted run can be resumed: complete conversions are skipped and anything
+partial is redone.
 """
 
 import sys
 import os
+import json
 import subprocess
 import platform
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+_heif_opener_registered = False
+
+MANIFEST_NAME = '.heic_conversions.json'
+MANIFEST_SAVE_EVERY = 50  # Conversions between manifest checkpoints
+
+def register_heif_opener_once():
+    """Register the pillow-heif opener with Pillow once per process"""
+    global _heif_opener_registered
+    if not _heif_opener_registered:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+        _heif_opener_registered = True
+
 def check_dependencies():
     """Check if required dependencies are available"""
     system = platform.system()
@@ -53,10 +75,9 @@ def convert_with_pillow_heif(heic_file, jpg_file, quality):
     """Convert using pillow-heif (works on Linux and macOS)"""
     try:
         from PIL import Image
-        import pillow_heif
         
-        # Register HEIF opener with Pillow
-        pillow_heif.register_heif_opener()
+        # Register HEIF opener with Pillow (a no-op after the first file)
+        register_heif_opener_once()
         
         # Open HEIC file and convert to JPG
         with Image.open(heic_file) as img:
@@ -78,7 +99,67 @@ def convert_with_pillow_heif(heic_file, jpg_file, quality):
     except Exception as e:
         return False, str(e)
 
-def convert_heic_to_jpg(target_dir, quality=85, remove_original=False):
+def load_conversion_manifest(target_path):
+    """{source path relative to target_path: {'size', 'mtime_ns', 'output'}} of finished conversions"""
+    manifest_path = target_path / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: could not read {manifest_path} ({e}); re-checking every file")
+        return {}
+
+def save_conversion_manifest(target_path, manifest):
+    """Write the manifest via a temp file and rename"""
+    manifest_path = target_path / MANIFEST_NAME
+    tmp_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def is_complete_jpeg(jpg_file):
+    """True if the file ends with the JPEG end-of-image marker (a truncated write does not)"""
+    try:
+        with open(jpg_file, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 64))
+            return f.read().rstrip(b'\x00').endswith(b'\xff\xd9')
+    except OSError:
+        return False
+
+def _init_worker(method):
+    """ProcessPoolExecutor initializer: register the HEIF opener once per worker process"""
+    if method == "pillow-heif":
+        try:
+            register_heif_opener_once()
+        except ImportError:
+            pass  # Reported per file by convert_with_pillow_heif
+
+def convert_file(heic_file, jpg_file, method, quality):
+    """
+    Convert one file with the given method. The JPG is written to a temp file
+    next to jpg_file and renamed into place only once it is complete. The temp
+    file ends in .part, so one left by a killed run is never picked up as a photo.
+    
+    Returns:
+        tuple: (success, error message, seconds taken, HEIC size in bytes)
+    """
+    ts = time.perf_counter()
+    tmp_file = jpg_file.with_name(f".{jpg_file.name}.part")
+    if method == "sips":
+        success, error_msg = convert_with_sips(heic_file, tmp_file, quality)
+    else:
+        success, error_msg = convert_with_pillow_heif(heic_file, tmp_file, quality)
+    if success:
+        os.replace(tmp_file, jpg_file)
+    else:
+        tmp_file.unlink(missing_ok=True)
+    return success, error_msg, time.perf_counter() - ts, heic_file.stat().st_size
+
+def convert_heic_to_jpg(target_dir, quality=85, remove_original=False, jobs=1, recursive=False):
     """
     Convert all HEIC files in target directory to JPG.
     
@@ -86,6 +167,8 @@ def convert_heic_to_jpg(target_dir, quality=85, remove_original=False):
         target_dir (str): Directory containing HEIC files
         quality (int): JPEG quality (1-100, default 85)
         remove_original (bool): Whether to delete original HEIC files
+        jobs (int): Number of worker processes; 1 converts in this process
+        recursive (bool): Also convert HEIC files in subdirectories
     """
     target_path = Path(target_dir)
     
@@ -104,7 +187,7 @@ def convert_heic_to_jpg(target_dir, quality=85, remove_original=False):
     # Find all HEIC files
     heic_files = []
     for ext in ['*.heic', '*.HEIC']:
-        heic_files.extend(target_path.glob(ext))
+        heic_files.extend(target_path.rglob(ext) if recursive else target_path.glob(ext))
     
     if not heic_files:
         print(f"No HEIC files found in '{target_dir}'")
@@ -112,28 +195,50 @@ def convert_heic_to_jpg(target_dir, quality=85, remove_original=False):
     
     print(f"Found {len(heic_files)} HEIC files to convert")
     
-    converted_count = 0
-    failed_count = 0
-    
+    # Diff against the manifest: skip conversions recorded for this exact source
+    manifest = load_conversion_manifest(target_path)
+    seen = set()
+    pending = []
+    skipped_count = 0
     for heic_file in heic_files:
         jpg_file = heic_file.with_suffix('.jpg')
+        source = heic_file.relative_to(target_path).as_posix()
+        stat = heic_file.stat()
+        seen.add(source)
+        entry = manifest.get(source)
         
-        # Skip if JPG already exists
-        if jpg_file.exists():
-            print(f"Skipping {heic_file.name} - {jpg_file.name} already exists")
+        if entry is not None:
+            if (entry['size'], entry['mtime_ns']) == (stat.st_size, stat.st_mtime_ns) and jpg_file.exists():
+                skipped_count += 1
+                continue
+        elif jpg_file.exists() and is_complete_jpeg(jpg_file) and jpg_file.stat().st_mtime_ns >= stat.st_mtime_ns:
+            # Converted before the manifest existed; adopt it rather than convert again
+            manifest[source] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                'output': jpg_file.relative_to(target_path).as_posix()}
+            skipped_count += 1
             continue
-        
-        print(f"Converting: {heic_file.name} -> {jpg_file.name}")
-        
-        # Convert based on available method
-        if method == "sips":
-            success, error_msg = convert_with_sips(heic_file, jpg_file, quality)
-        else:
-            success, error_msg = convert_with_pillow_heif(heic_file, jpg_file, quality)
-        
+        pending.append((heic_file, jpg_file, source, stat))
+    
+    # Forget sources that are gone (e.g. removed with --remove-original)
+    manifest = {source: entry for source, entry in manifest.items() if source in seen}
+    if skipped_count:
+        print(f"Skipping {skipped_count} files already converted")
+    
+    converted_count = 0
+    failed_count = 0
+    converted_bytes = 0
+    ts = time.perf_counter()
+    
+    def report(heic_file, jpg_file, source, stat, success, error_msg, seconds, size):
+        nonlocal converted_count, failed_count, converted_bytes
         if success:
-            print(f"  ✓ Successfully converted to {jpg_file.name}")
+            print(f"  ✓ Converted {heic_file.name} -> {jpg_file.name} in {seconds:.2f}s ({size / seconds / 1e6:.1f} MB/s)")
             converted_count += 1
+            converted_bytes += size
+            manifest[source] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                                'output': jpg_file.relative_to(target_path).as_posix()}
+            if converted_count % MANIFEST_SAVE_EVERY == 0:
+                save_conversion_manifest(target_path, manifest)
             
             # Remove original if requested
             if remove_original:
@@ -143,26 +248,54 @@ def convert_heic_to_jpg(target_dir, quality=85, remove_original=False):
             print(f"  ✗ Failed to convert {heic_file.name}: {error_msg}")
             failed_count += 1
     
+    try:
+        if jobs > 1:
+            print(f"Converting {len(pending)} files with {jobs} worker processes")
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(method,)) as pool:
+                futures = {
+                    pool.submit(convert_file, job[0], job[1], method, quality): job
+                    for job in pending
+                }
+                for future in as_completed(futures):
+                    try:
+                        report(*futures[future], *future.result())
+                    except Exception as e:
+                        report(*futures[future], False, str(e), 0, 0)
+        else:
+            for heic_file, jpg_file, source, stat in pending:
+                print(f"Converting: {heic_file.name} -> {jpg_file.name}")
+                report(heic_file, jpg_file, source, stat, *convert_file(heic_file, jpg_file, method, quality))
+    finally:
+        save_conversion_manifest(target_path, manifest)
+    
+    elapsed = time.perf_counter() - ts
     print(f"\nConversion complete:")
     print(f"  Successfully converted: {converted_count}")
     print(f"  Failed: {failed_count}")
+    if converted_count:
+        print(f"  Throughput: {converted_count / elapsed:.2f} files/s, {converted_bytes / elapsed / 1e6:.1f} MB/s "
+              f"({elapsed:.1f}s with {jobs} {'processes' if jobs > 1 else 'process'})")
     if remove_original and converted_count > 0:
         print(f"  Original HEIC files removed: {converted_count}")
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python convert_heic_cross_platform.py <target_directory> [--remove-original] [--quality=85]")
+        print("Usage: python convert_heic_cross_platform.py <target_directory> [--remove-original] [--quality=85] [--jobs=N]")
         print("\nOptions:")
         print("  --remove-original    Delete original HEIC files after conversion")
         print("  --quality=N          JPEG quality (1-100, default: 85)")
+        print("  --jobs=N             Convert on N worker processes (default: 1)")
+        print("  --recursive          Also convert HEIC files in subdirectories")
         print("\nExample:")
         print("  python convert_heic_cross_platform.py assets/img/photos")
         print("  python convert_heic_cross_platform.py assets/img/photos --quality=90 --remove-original")
+        print("  python convert_heic_cross_platform.py assets/img/photos --jobs=8")
         print("\nNote: On Linux, requires 'pillow-heif' package: pip install pillow-heif")
         sys.exit(1)
     
     target_dir = sys.argv[1]
     remove_original = '--remove-original' in sys.argv
+    recursive = '--recursive' in sys.argv
     
     # Parse quality setting
     quality = 85
@@ -177,13 +310,28 @@ def main():
                 print("Error: Invalid quality value")
                 sys.exit(1)
     
+    # Parse worker count (--jobs=N or --jobs N)
+    jobs = 1
+    for i, arg in enumerate(sys.argv):
+        if arg.startswith('--jobs'):
+            value = arg.split('=')[1] if '=' in arg else (sys.argv[i + 1] if i + 1 < len(sys.argv) else '')
+            try:
+                jobs = int(value)
+                if jobs < 1:
+                    raise ValueError
+            except ValueError:
+                print("Error: --jobs must be a positive integer")
+                sys.exit(1)
+    
     print(f"Operating System: {platform.system()}")
     print(f"Target directory: {target_dir}")
     print(f"JPEG quality: {quality}")
     print(f"Remove originals: {remove_original}")
+    print(f"Worker processes: {jobs}")
+    print(f"Recursive: {recursive}")
     print()
     
-    convert_heic_to_jpg(target_dir, quality, remove_original)
+    convert_heic_to_jpg(target_dir, quality, remove_original, jobs, recursive)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,14 +1,13 @@
 import os
 import sys
-import yaml
+import time
 from pathlib import Path
 from PIL import Image, ImageOps
 import io
-from object_detection import detect_object
-from image_description import describe_image
-from sentiment_analysis import analyze_single_image
-from analyze_color import analyze_color_by_sections
+from model_server import get_inference_client
 from get_time_photo_taken import extract_timestamp
+from photos_md_store import PhotosMdStore
+from photo_files import scan_tree, remove_files
 
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,31 +21,28 @@ def parse_location(filename):
         return city, country
     return "Unknown", "Unknown"
 
-def cleanup_orphaned_optimized_files(photos_base_dir, optimized_dir):
-    """Remove optimized files that no longer have corresponding originals"""
-    logger.info(f"\nCleaning up orphaned files in {optimized_dir}")
+def cleanup_orphaned_optimized_files(photos_base_dir, optimized_dir, dry_run=False):
+    """Remove optimized files that no longer have corresponding originals.
     
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.PNG'}
-    cleaned_count = 0
+    Each tree is walked once; an optimized file is an orphan when no original
+    anywhere under photos_base_dir has its stem. With dry_run, orphans are only reported."""
+    logger.info(f"\nCleaning up orphaned files in {optimized_dir}{' (dry run)' if dry_run else ''}")
+    ts = time.perf_counter()
     
-    for optimized_file in optimized_dir.glob("*"):
-        if optimized_file.is_file() and optimized_file.suffix.lower() in image_extensions:
-            # For files without '_optimized' suffix, check if original exists
-            original_stem = optimized_file.stem.replace('_optimized', '')
-            
-            # Check if any original file with this stem exists recursively
-            original_exists = any(
-                original_file.stem == original_stem
-                for original_file in photos_base_dir.rglob("*")
-                if original_file.is_file() and original_file.suffix.lower() in image_extensions
-            )
-            
-            if not original_exists:
-                logger.info(f"  Removing orphaned file: {optimized_file.name}")
-                optimized_file.unlink()
-                cleaned_count += 1
+    original_stems = {os.path.splitext(os.path.basename(p))[0] for p in scan_tree(photos_base_dir)}
+    # Optimized files are written flat into optimized_dir
+    optimized = [p for p in scan_tree(optimized_dir) if '/' not in p]
+    orphans = [
+        p for p in optimized
+        if os.path.splitext(p)[0].replace('_optimized', '') not in original_stems
+    ]
     
-    logger.info(f"Cleaned up {cleaned_count} orphaned files")
+    for relative_path in orphans:
+        logger.info(f"  {'Would remove' if dry_run else 'Removing'} orphaned file: {relative_path}")
+    remove_files(optimized_dir, orphans, dry_run=dry_run)
+    
+    logger.info(f"{'Found' if dry_run else 'Cleaned up'} {len(orphans)} orphaned files in {time.perf_counter() - ts:.3f}s")
+    return orphans
 
 def optimize_image(image_path, max_size_kb, max_dimension):
     """Optimize image by resizing and compressing until it's under max_size_kb"""
@@ -108,57 +104,6 @@ def optimize_image(image_path, max_size_kb, max_dimension):
     logger.info(f"  Final size: {current_size:.2f}KB")
     return img
 
-def update_photos_md(new_item):
-    """Update photos.md by adding or updating an item"""
-    logger.info(f"Updating photos.md with item: {new_item['title']}")
-    
-    # Load existing data
-    existing_items = []
-    if os.path.exists('photos.md'):
-        try:
-            with open('photos.md', 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Extract YAML front matter
-                if content.startswith('---'):
-                    yaml_end = content.find('---', 3)
-                    if yaml_end != -1:
-                        yaml_content = content[3:yaml_end]
-                        existing_data = yaml.safe_load(yaml_content)
-                        if existing_data and 'items' in existing_data:
-                            existing_items = existing_data['items']
-        except Exception as e:
-            logger.info(f"Could not load existing photos.md: {e}")
-    
-    # Find if item already exists and update it, or add new item
-    item_found = False
-    for i, existing_item in enumerate(existing_items):
-        if existing_item.get('title') == new_item['title']:
-            existing_items[i] = new_item  # Update existing item
-            item_found = True
-            logger.debug(f"Updated existing item: {new_item['title']}")
-            break
-    
-    if not item_found:
-        existing_items.append(new_item)  # Add new item
-        logger.info(f"Added new item: {new_item['title']}")
-    
-    # Create front matter with updated items
-    front_matter = {
-        'layout': 'photos',
-        'title': 'Life',
-        'slug': '/photos',
-        'items': existing_items
-    }
-
-    # Generate the photos.md content
-    content = "---\n"
-    content += yaml.dump(front_matter, allow_unicode=True, default_flow_style=False)
-    content += "---\n"
-
-    # Write to photos.md
-    with open('photos.md', 'w', encoding='utf-8') as f:
-        f.write(content)
-
 def generate_photos_md(max_size_kb, max_dimension, run_sentiment_analysis=False, run_color_analysis=False, run_object_detection=False, run_timestamp=False):
     # Path to your photos directory and optimized photos directory
     photos_dir = Path("assets/img/photos")
@@ -167,25 +112,11 @@ def generate_photos_md(max_size_kb, max_dimension, run_sentiment_analysis=False,
     optimized_dir.mkdir(exist_ok=True)
     cleanup_orphaned_optimized_files(photos_dir, optimized_dir)
     
-    # Load existing photos.md to check for existing objects data
-    existing_items = {}
-    if os.path.exists('photos.md'):
-        try:
-            with open('photos.md', 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Extract YAML front matter
-                if content.startswith('---'):
-                    yaml_end = content.find('---', 3)
-                    if yaml_end != -1:
-                        yaml_content = content[3:yaml_end]
-                        existing_data = yaml.safe_load(yaml_content)
-                        if existing_data and 'items' in existing_data:
-                            # Create a lookup dict by title for quick access
-                            for item in existing_data['items']:
-                                existing_items[item.get('title', '')] = item
-                            logger.info(f"Loaded {len(existing_items)} existing items from photos.md")
-        except Exception as e:
-            logger.info(f"Could not load existing photos.md: {e}")
+    # Load photos.md once; items are merged into this index and written at checkpoints
+    store = PhotosMdStore('photos.md')
+    existing_items = dict(store.items)
+    
+    inference = get_inference_client() if (run_sentiment_analysis or run_object_detection) else None
     
     # List to store photo items
     items = []
@@ -243,7 +174,7 @@ def generate_photos_md(max_size_kb, max_dimension, run_sentiment_analysis=False,
                 logger.info(f"- Skipping sentiment analysis, field already exists")
                 sentiments_str = existing_item['sentiment']
             else:
-                sentiment_list = analyze_single_image(photo_file, confidence_threshold=0.2)
+                sentiment_list = inference.analyze_sentiment(photo_file, confidence_threshold=0.2)
                 sentiments_str = ', '.join(sentiment_list) if sentiment_list else 'None'
                 logger.info(f"- Analyzed sentiment: {sentiments_str}")
         else:
@@ -253,6 +184,8 @@ def generate_photos_md(max_size_kb, max_dimension, run_sentiment_analysis=False,
         ## Color analysis ##
         ####################
         if run_color_analysis:
+            # Imported here so runs without color analysis don't pay for cv2 and sklearn
+            from analyze_color import analyze_color_by_sections
             update_color_field = True
             if not update_color_field and 'color' in existing_item and existing_item.get('color') and existing_item['color'] != 'None':
                 logger.info(f"- Skipping color analysis, field already exists")
@@ -296,8 +229,8 @@ def generate_photos_md(max_size_kb, max_dimension, run_sentiment_analysis=False,
                 logger.info(f"\tSkip object detection")
                 objects_str = existing_item['objects']
             else:
-                objects = detect_object(photo_file, 'l', 640)
-                objects_str = ",".join(objects) if objects else "None"
+                objects = inference.detect_object(photo_file, 'l', 640)
+                objects_str = ', '.join(objects) if objects else 'None'
                 logger.info(f"- Detected objects: {objects_str}")
         else:
             objects_str = existing_item.get('objects', '')
@@ -317,10 +250,14 @@ def generate_photos_md(max_size_kb, max_dimension, run_sentiment_analysis=False,
             'timestamp': timestamp_str,
         }
         
-        # Update MD file with just this new item
-        update_photos_md(item)
+        store.merge([item])
         items.append(item)
+        
+        # Checkpoint so an interrupted run keeps its progress
+        if len(items) % 100 == 0:
+            store.save()
 
+    store.save()
     logger.info(f"\nFinished! photos.md has been updated with {len(items)} items.")
 
 
@@ -1,25 +1,60 @@
 import os
-import sys
-import yaml
+import argparse
+import time
 from pathlib import Path
 from PIL import Image, ImageOps
 import io
-from object_detection import detect_object
-from image_description import describe_image
-from sentiment_analysis import analyze_single_image
-from analyze_color import analyze_color_by_sections
-from get_time_photo_taken import extract_timestamp
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from model_server import get_inference_client
+from get_time_photo_taken import extract_timestamp, lookup_indexed_timestamp
+from analysis_cache import AnalysisCache
+from photo_frame import PhotoFrame, estimate_decoded_bytes
+from photos_md_store import PhotosMdStore
+from photo_pipeline import Stage
+from photo_files import scan_tree, remove_files, optimized_relative_path, converted_heifs
+from photo_manifest import PhotoManifest
+from memory_budget import MemoryBudget, peak_rss_mb
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import multiprocessing
 import threading
-from queue import Queue
 
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Thread-safe queue for updating photos.md
-update_queue = Queue()
-queue_lock = threading.Lock()
+# Analyzer parameters; these are passed to the analyzers and are part of the
+# analysis cache key, so changing any of them re-runs that analyzer
+SENTIMENT_PARAMS = {'confidence_threshold': 0.2}
+COLOR_PARAMS = {'grid_size': (3, 3), 'colors_per_section': 3, 'min_percentage': 2.0, 'method': 'minibatch'}
+# Bumped when extract_timestamp changes which tag it reports, so cached timestamps are redone
+TIMESTAMP_PARAMS = {'version': 2}
+# Tags are the top_k classes with a box at or above min_confidence, most frequent first
+OBJECT_DETECTION_PARAMS = {'model_size': 'l', 'image_size': 640, 'min_confidence': 0.25, 'top_k': 5}
+OBJECT_DETECTION_BATCH_SIZE = 8  # Images per YOLO forward pass in the pipeline's objects stage
+# YOLO runtime: 'torch', 'onnx', 'openvino' or 'openvino-int8' (see object_detection.BACKENDS).
+# The backends agree on classes (check_yolo_backend_parity.py), so it is not part of the cache key
+OBJECT_DETECTION_BACKEND = 'torch'
+ANALYZER_PARAMS = {
+    'sentiment': SENTIMENT_PARAMS,
+    'color': COLOR_PARAMS,
+    'timestamp': TIMESTAMP_PARAMS,
+    'objects': OBJECT_DETECTION_PARAMS,
+}
+# Smallest (long side, short side) each consumer of the decoded pixels needs, so
+# large JPEGs are decoded at a reduced scale (PhotoFrame.request_size). Optimize
+# resizes to 1200px, color analysis to fit 800x600, YOLO letterboxes the long side
+# to image_size and CLIP resizes the short side to 224. Timestamps need no pixels
+DECODE_SIZES = {
+    'optimize': (1200, 0),
+    'sentiment': (0, 224),
+    'color': (800, 600),
+    'objects': (OBJECT_DETECTION_PARAMS['image_size'], 0),
+}
+# A photo in flight holds its decoded image plus about one full copy (the RGB
+# conversion or the NumPy array color analysis reads); see estimate_photo_bytes
+DECODED_COPIES = 2
+
+# Per-process state for --executor process, set up once by _init_photo_worker
+_worker_state = {}
 
 def parse_location(filename):
     if ',' in filename:
@@ -28,68 +63,40 @@ def parse_location(filename):
         return city, country
     return "Unknown", "Unknown"
 
-def cleanup_orphaned_optimized_files(photos_base_dir, optimized_dir):
-    """Remove optimized files that no longer have corresponding originals"""
-    logger.info(f"\nCleaning up orphaned files in {optimized_dir}")
+def cleanup_orphaned_optimized_files(photos_base_dir, optimized_dir, dry_run=False):
+    """Remove optimized files that no longer have corresponding originals.
     
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.PNG'}
-    cleaned_count = 0
+    Each tree is walked once into a set of relative paths, and the orphans are
+    the set difference. With dry_run, orphans are only reported."""
+    logger.info(f"\nCleaning up orphaned files in {optimized_dir}{' (dry run)' if dry_run else ''}")
+    ts = time.perf_counter()
     
-    # Get all optimized files recursively
-    for optimized_file in optimized_dir.rglob("*"):
-        if optimized_file.is_file() and optimized_file.suffix.lower() in image_extensions:
-            # Calculate the relative path from optimized directory
-            relative_path = optimized_file.relative_to(optimized_dir)
-            
-            # Check if corresponding original file exists
-            original_file = photos_base_dir / relative_path
-            
-            if not original_file.exists():
-                logger.info(f"  Removing orphaned file: {relative_path}")
-                optimized_file.unlink()
-                cleaned_count += 1
-                
-                # Remove empty parent directories
-                try:
-                    optimized_file.parent.rmdir()
-                except OSError:
-                    pass  # Directory not empty, that's fine
-    
-    logger.info(f"Cleaned up {cleaned_count} orphaned files")
-
-def optimize_image(image_path, max_size_kb):
-    """Optimize image by resizing and compressing until it's under max_size_kb"""
-    logger.info(f"\nProcessing {image_path.name}:")
+    originals = scan_tree(photos_base_dir)
+    optimized = scan_tree(optimized_dir)
+    # HEIC originals are optimized to .jpg
+    expected = {optimized_relative_path(rel_path).as_posix() for rel_path in originals}
+    orphans = sorted(optimized.keys() - expected)
+    scan_time = time.perf_counter() - ts
     
-    # Open image and apply EXIF orientation to prevent rotation issues
-    img = Image.open(image_path)
-    img = ImageOps.exif_transpose(img)  # This fixes rotation issues
+    for relative_path in orphans:
+        logger.info(f"  {'Would remove' if dry_run else 'Removing'} orphaned file: {relative_path}")
+    remove_files(optimized_dir, orphans, dry_run=dry_run)
     
-    # Convert RGBA to RGB if necessary
-    if img.mode in ('RGBA', 'LA'):
-        logger.info(f"  Converting {img.mode} to RGB")
-        background = Image.new('RGB', img.size, (255, 255, 255))
-        background.paste(img, mask=img.split()[-1])
-        img = background
-
-    # Calculate initial size
-    temp_buffer = io.BytesIO()
-    img.save(temp_buffer, format='JPEG', quality=85)
-    current_size = len(temp_buffer.getvalue()) / 1024  # Size in KB
-    logger.info(f"  Original size: {current_size:.2f}KB")
+    logger.info(f"{'Found' if dry_run else 'Cleaned up'} {len(orphans)} orphaned files "
+                f"(scanned {len(originals)} originals and {len(optimized)} optimized in {scan_time:.3f}s, "
+                f"total {time.perf_counter() - ts:.3f}s)")
+    return orphans
 
-    # If image is already small enough, just return optimized version
-    if current_size <= max_size_kb:
-        logger.info(f"  Image is already under {max_size_kb}KB, skipping optimization")
-        return img
+def _encode_jpeg(img, quality):
+    buffer = io.BytesIO()
+    img.save(buffer, format='JPEG', quality=quality)
+    return buffer.getvalue()
 
-    # Calculate new dimensions while maintaining exact aspect ratio
+def _resize_to_max_dimension(img, max_dimension):
+    """Scale the long side down to max_dimension, keeping the aspect ratio"""
     original_width, original_height = img.size
     aspect_ratio = original_width / original_height
     
-    # Start with a reasonable max dimension and scale down if needed
-    max_dimension = 1200
-    
     if original_width > original_height:
         new_width = min(max_dimension, original_width)
         new_height = int(new_width / aspect_ratio)
@@ -97,100 +104,216 @@ def optimize_image(image_path, max_size_kb):
         new_height = min(max_dimension, original_height)
         new_width = int(new_height * aspect_ratio)
     
+    if (new_width, new_height) == img.size:
+        return img
+    
     logger.info(f"  Original dimensions: {original_width}x{original_height}")
     logger.info(f"  New dimensions: {new_width}x{new_height}")
     logger.info(f"  Aspect ratio preserved: {aspect_ratio:.3f}")
-    
-    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return img.resize((new_width, new_height), Image.Resampling.LANCZOS)
 
-    # Compress with decreasing quality until size is under max_size_kb
-    quality = 85
-    while quality > 20:
-        temp_buffer = io.BytesIO()
-        img.save(temp_buffer, format='JPEG', quality=quality)
-        current_size = len(temp_buffer.getvalue()) / 1024
-        logger.info(f"  Quality {quality}: {current_size:.2f}KB")
+def optimize_image(image_path, max_size_kb, image=None, max_dimension=1200, min_dimension=480,
+                   qualities=range(25, 90, 5)):
+    """Encode the image as a JPEG under max_size_kb and return the encoded bytes.
+    Pass an already decoded, EXIF-transposed PIL image to skip reading image_path.
+    
+    Images larger than max_dimension are always resized first, even when the
+    full-resolution image would fit under max_size_kb, so every published photo
+    is at most max_dimension on its long side (the analysis stages rely on this
+    to decode large JPEGs at reduced scale, see DECODE_SIZES). The highest quality in
+    `qualities` that fits is found by binary search (about 4 encodes instead of a
+    linear walk down from 85). If even the lowest quality is too large, the image
+    is shrunk by 25% and searched again, down to min_dimension. The returned bytes
+    are the winning encode, so callers write them as-is instead of re-encoding."""
+    logger.info(f"\nProcessing {image_path.name}:")
+    
+    if image is not None:
+        img = image
+    else:
+        # Open image and apply EXIF orientation to prevent rotation issues
+        img = Image.open(image_path)
+        img = ImageOps.exif_transpose(img)  # This fixes rotation issues
+    
+    # Convert RGBA to RGB if necessary. Resize first, so the flattened copy is
+    # made at the output size rather than next to a full-size original
+    if img.mode in ('RGBA', 'LA'):
+        logger.info(f"  Converting {img.mode} to RGB")
+        img = _resize_to_max_dimension(img, max_dimension)
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    
+    max_bytes = max_size_kb * 1024
+    qualities = sorted(qualities)
+    source = img
+    img = _resize_to_max_dimension(source, max_dimension)
+    encodes = 0
+    
+    while True:
+        # Binary search for the highest quality that fits the budget
+        best = None
+        lo, hi = 0, len(qualities) - 1
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            data = _encode_jpeg(img, qualities[mid])
+            encodes += 1
+            logger.info(f"  Quality {qualities[mid]}: {len(data) / 1024:.2f}KB")
+            if len(data) <= max_bytes:
+                best = (qualities[mid], data)
+                lo = mid + 1
+            else:
+                smallest = data
+                hi = mid - 1
         
-        if current_size <= max_size_kb:
-            break
-            
-        quality -= 5
+        if best is not None:
+            quality, data = best
+            logger.info(f"  Final size: {len(data) / 1024:.2f}KB at quality {quality}, {img.size[0]}x{img.size[1]} ({encodes} encodes)")
+            return data
+        
+        # Even the lowest quality is over budget: shrink the image and search again
+        long_side = max(img.size)
+        if long_side <= min_dimension:
+            logger.info(f"  Could not get under {max_size_kb}KB, using {len(smallest) / 1024:.2f}KB ({encodes} encodes)")
+            return smallest
+        # Resample from the source each time so blur doesn't compound
+        img = _resize_to_max_dimension(source, max(min_dimension, int(long_side * 0.75)))
 
-    logger.info(f"  Final size: {current_size:.2f}KB")
-    return img
+def request_decode_sizes(frame, consumers):
+    """Tell the frame which consumers will read its pixels, before it is decoded"""
+    for name in consumers:
+        if name in DECODE_SIZES:
+            frame.request_size(*DECODE_SIZES[name])
 
-def update_photos_md_batch(items_batch):
-    """Thread-safe batch update of photos.md"""
-    with queue_lock:
-        logger.info(f"Batch updating photos.md with {len(items_batch)} items")
-        
-        # Load existing data
-        existing_items = []
-        if os.path.exists('photos.md'):
-            try:
-                with open('photos.md', 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # Extract YAML front matter
-                    if content.startswith('---'):
-                        yaml_end = content.find('---', 3)
-                        if yaml_end != -1:
-                            yaml_content = content[3:yaml_end]
-                            existing_data = yaml.safe_load(yaml_content)
-                            if existing_data and 'items' in existing_data:
-                                existing_items = existing_data['items']
-            except Exception as e:
-                logger.info(f"Could not load existing photos.md: {e}")
-        
-        # Update or add items from batch
-        for new_item in items_batch:
-            item_found = False
-            for i, existing_item in enumerate(existing_items):
-                if existing_item.get('title') == new_item['title']:
-                    existing_items[i] = new_item  # Update existing item
-                    item_found = True
-                    break
-            
-            if not item_found:
-                existing_items.append(new_item)  # Add new item
-        
-        # Create front matter with updated items
-        front_matter = {
-            'layout': 'photos',
-            'title': 'Life',
-            'slug': '/photos',
-            'items': existing_items
-        }
-
-        # Generate the photos.md content
-        content = "---\n"
-        content += yaml.dump(front_matter, allow_unicode=True, default_flow_style=False)
-        content += "---\n"
-
-        # Write to photos.md
-        with open('photos.md', 'w', encoding='utf-8') as f:
-            f.write(content)
-
-def process_single_photo(photo_file, photos_base_dir, optimized_dir, max_size_kb, existing_items, 
+def pixel_consumers(optimized_path, analyzers):
+    """What will read a photo's pixels: optimize if its output is missing, plus the analyzers"""
+    return (['optimize'] if not optimized_path.exists() else []) + list(analyzers)
+
+def estimate_photo_bytes(photo_file, consumers):
+    """Bytes a photo holds while it is processed, from its file size and image header"""
+    try:
+        nbytes = photo_file.stat().st_size
+    except OSError:
+        return 0  # Gone since the scan; processing it will report the error
+    sizes = [DECODE_SIZES[name] for name in consumers if name in DECODE_SIZES]
+    if sizes:
+        long_side = max(size[0] for size in sizes)
+        short_side = max(size[1] for size in sizes)
+        nbytes += DECODED_COPIES * estimate_decoded_bytes(photo_file, long_side, short_side)
+    return nbytes
+
+def log_peak_memory(budget, worker_processes=False):
+    own_mb, child_mb = peak_rss_mb()
+    logger.info(f"Peak RSS: {own_mb:.0f}MB" + (f", largest worker process: {child_mb:.0f}MB" if worker_processes else ""))
+    if budget.limit_bytes is not None:
+        logger.info(f"Memory budget: {budget.limit_bytes / 2**20:.0f}MB, peak admitted {budget.peak / 2**20:.0f}MB, "
+                    f"admission waited {budget.waits} times")
+
+def write_optimized_image(photo_file, frame, optimized_path, max_size_kb):
+    """Optimize the frame's image and write it to optimized_path"""
+    optimized_bytes = optimize_image(photo_file, max_size_kb, image=frame.image)
+    # Write the size-tuned encode as-is; the rename keeps a crashed run
+    # from leaving a partial file that the exists() check would skip
+    optimized_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = optimized_path.with_name(f".{optimized_path.name}.tmp")
+    tmp_path.write_bytes(optimized_bytes)
+    os.replace(tmp_path, optimized_path)
+
+def format_sentiment(sentiment_list):
+    return ', '.join(sentiment_list) if sentiment_list else 'None'
+
+def compute_sentiment(photo_file, frame, inference):
+    # analyze_sentiment raises on failure, so only real results reach the cache
+    return format_sentiment(inference.analyze_sentiment(photo_file, **SENTIMENT_PARAMS, image=frame.rgb_image))
+
+def compute_color(photo_file, frame):
+    # Imported on first use: sklearn alone takes over a second to import, which
+    # would dominate runs where nothing changed
+    from analyze_color import analyze_color_by_sections
+    color_list = analyze_color_by_sections(photo_file, **COLOR_PARAMS, image=frame.rgb)
+    if color_list is None:
+        # analyze_color_by_sections returns None when it fails; raise so it isn't cached as 'None'
+        raise RuntimeError(f"color analysis failed for {photo_file.name}")
+    return ', '.join(color_list) if color_list else 'None'
+
+def compute_timestamp(photo_file, frame):
+    # A sidecar index from `get_time_photo_taken.py assets/img/photos --index` saves opening the file here
+    timestamp = lookup_indexed_timestamp(photo_file)
+    if timestamp is not None:
+        return timestamp
+    timestamp = extract_timestamp(photo_file, exif=frame.exif)
+    # extract_timestamp hands back its result dict for files without EXIF
+    return timestamp if isinstance(timestamp, str) else ""
+
+def merge_timestamp(timestamp, existing_item):
+    """
+    An empty extracted timestamp (no EXIF) must not overwrite one already in
+    photos.md: those are often typed in by hand and can't be recovered.
+    """
+    existing = existing_item.get('timestamp')
+    # str(): YAML loads a hand-typed, unquoted date as a datetime
+    if not timestamp and existing and str(existing).lower() not in ['none', 'null']:
+        return existing
+    return timestamp
+
+def format_objects(objects):
+    # One tag per class (detect_object summarizes boxes per class), not one per box
+    return ', '.join(objects) if objects else 'None'
+
+def compute_objects(photo_file, frame, inference):
+    return format_objects(inference.detect_object(photo_file, **OBJECT_DETECTION_PARAMS, image=frame.rgb_image,
+                                                  backend=OBJECT_DETECTION_BACKEND))
+
+def photo_title(photo_file):
+    return photo_file.stem.replace('-', ' ').replace('_', ' ')
+
+def build_photo_item(photo_file, relative_path, sentiment, objects, color, timestamp):
+    city, country = parse_location(photo_file.stem)
+    return {
+        'title': photo_title(photo_file),
+        'image': {
+            'src': f"/assets/img/photos_optimized/{relative_path}",  # Preserves subdirectory structure
+            'alt': photo_title(photo_file)
+        },
+        'city': city,
+        'country': country,
+        'sentiment': sentiment,
+        'objects': objects,
+        'color': color,
+        'timestamp': timestamp,
+    }
+
+def process_single_photo(photo_file, photos_base_dir, optimized_dir, max_size_kb, existing_items, cache, inference,
                         run_sentiment_analysis, run_color_analysis, run_object_detection, run_timestamp, 
                         processed_count, total_files):
-    """Process a single photo - this function will be run in parallel"""
+    """Process a single photo - this function will be run in parallel.
+    
+    Returns (photos.md item, content hash, analyzers that succeeded), or None on failure."""
     try:
         # Calculate relative path from base photos directory
         relative_path = photo_file.relative_to(photos_base_dir)
         
         # Create the same subdirectory structure in optimized folder
-        optimized_path = optimized_dir / relative_path
-        optimized_path.parent.mkdir(parents=True, exist_ok=True)
+        optimized_relative = optimized_relative_path(relative_path.as_posix())
+        optimized_path = optimized_dir / optimized_relative
         
-        thread_id = threading.current_thread().name
+        thread_id = _worker_name()
         logger.info(f"[{thread_id}] Processing {photo_file.name} from {photo_file.parent.name}/ ({processed_count}/{total_files})")
         
+        # Read the file once; it is decoded at most once, on first use, and the
+        # same decoded image is handed to every stage below
+        frame = PhotoFrame(photo_file)
+        needs_optimize = not optimized_path.exists()
+        request_decode_sizes(frame, [name for name, enabled in [
+            ('optimize', needs_optimize), ('sentiment', run_sentiment_analysis),
+            ('color', run_color_analysis), ('objects', run_object_detection)] if enabled])
+        
         # Optimize image if not already optimized
-        if not optimized_path.exists():
+        if needs_optimize:
             logger.info(f"[{thread_id}] Original input photo: {processed_count}/{total_files}, output: {optimized_path}")
             try:
-                optimized_img = optimize_image(photo_file, max_size_kb)
-                optimized_img.save(optimized_path, 'JPEG', quality=85)
+                write_optimized_image(photo_file, frame, optimized_path, max_size_kb)
                 logger.info(f"[{thread_id}] Saved optimized image to: {optimized_path}")
             except Exception as e:
                 logger.info(f"[{thread_id}] Error processing {photo_file}: {e}")
@@ -198,28 +321,33 @@ def process_single_photo(photo_file, photos_base_dir, optimized_dir, max_size_kb
         else:
             logger.info(f"[{thread_id}] \tSkipping compression")
             
-        city, country = parse_location(photo_file.stem)
-        photo_title = photo_file.stem.replace('-', ' ').replace('_', ' ')
-        existing_item = existing_items.get(photo_title, {})
+        existing_item = existing_items.get(photo_title(photo_file), {})
+        
+        # Analyzer results are cached by file content, so renames don't re-run
+        # models and edited pixels under the same name aren't served stale tags
+        content_hash = frame.content_hash
         
         # Initialize variables
         sentiments_str = ""
         color_str = ""
         timestamp_str = ""
         objects_str = ""
+        # Analyzers that produced a result; a failed one keeps its photos.md field
+        # and is left out of the manifest, so the next run retries it
+        succeeded = []
         
         ########################
         ## Sentiment analysis ##
         ########################
         if run_sentiment_analysis:
-            # Check if sentiment already exists
-            if 'sentiment' in existing_item and existing_item.get('sentiment') and existing_item['sentiment'] != 'None':
-                logger.info(f"[{thread_id}] - Skipping sentiment analysis, field already exists")
-                sentiments_str = existing_item['sentiment']
-            else:
-                sentiment_list = analyze_single_image(photo_file, confidence_threshold=0.2)
-                sentiments_str = ', '.join(sentiment_list) if sentiment_list else 'None'
-                logger.info(f"[{thread_id}] - Analyzed sentiment: {sentiments_str}")
+            try:
+                sentiments_str, hit = cache.get_or_compute(content_hash, 'sentiment', SENTIMENT_PARAMS,
+                                                           lambda: compute_sentiment(photo_file, frame, inference))
+                logger.info(f"[{thread_id}] - {'Cached' if hit else 'Analyzed'} sentiment: {sentiments_str}")
+                succeeded.append('sentiment')
+            except Exception as e:
+                logger.info(f"[{thread_id}] Error analyzing sentiment for {photo_file.name}: {e}")
+                sentiments_str = existing_item.get('sentiment', '')
         else:
             sentiments_str = existing_item.get('sentiment', '')
             
@@ -227,18 +355,14 @@ def process_single_photo(photo_file, photos_base_dir, optimized_dir, max_size_kb
         ## Color analysis ##
         ####################
         if run_color_analysis:
-            update_color_field = True
-            if not update_color_field and 'color' in existing_item and existing_item.get('color') and existing_item['color'] != 'None':
-                logger.info(f"[{thread_id}] - Skipping color analysis, field already exists")
-                color_str = existing_item['color']
-            else:
-                try:
-                    color_list = analyze_color_by_sections(photo_file)
-                    color_str = ', '.join(color_list) if color_list else 'None'
-                    logger.info(f"[{thread_id}] \tcolor: {color_str}")
-                except Exception as e:
-                    logger.info(f"[{thread_id}] Error analyzing color for {photo_file.name}: {e}")
-                    color_str = 'None'
+            try:
+                color_str, hit = cache.get_or_compute(content_hash, 'color', COLOR_PARAMS,
+                                                      lambda: compute_color(photo_file, frame))
+                logger.info(f"[{thread_id}] \tcolor{' (cached)' if hit else ''}: {color_str}")
+                succeeded.append('color')
+            except Exception as e:
+                logger.info(f"[{thread_id}] Error analyzing color for {photo_file.name}: {e}")
+                color_str = existing_item.get('color', '')
         else:
             color_str = existing_item.get('color', '')
         
@@ -246,19 +370,16 @@ def process_single_photo(photo_file, photos_base_dir, optimized_dir, max_size_kb
         ## Timestamp ##
         ###############
         if run_timestamp:
-            if 'timestamp' in existing_item and existing_item.get('timestamp') and existing_item['timestamp'].lower() not in ['none', 'null', '']:
-                logger.info(f"[{thread_id}] \tSkip timestamp extraction, existing timestamp found: {existing_item['timestamp']}")
-                timestamp_str = existing_item['timestamp']
-            else:
-                try:
-                    timestamp_str = extract_timestamp(photo_file)
-                    if timestamp_str:
-                        logger.info(f"[{thread_id}] - Extracted timestamp: {timestamp_str}")
-                    else:
-                        timestamp_str = ""
-                except Exception as e:
-                    logger.info(f"[{thread_id}] Error extracting timestamp for {photo_file.name}: {e}")
-                    timestamp_str = ""
+            try:
+                timestamp_str, hit = cache.get_or_compute(content_hash, 'timestamp', TIMESTAMP_PARAMS,
+                                                          lambda: compute_timestamp(photo_file, frame))
+                timestamp_str = merge_timestamp(timestamp_str, existing_item)
+                if timestamp_str:
+                    logger.info(f"[{thread_id}] - {'Cached' if hit else 'Extracted'} timestamp: {timestamp_str}")
+                succeeded.append('timestamp')
+            except Exception as e:
+                logger.info(f"[{thread_id}] Error extracting timestamp for {photo_file.name}: {e}")
+                timestamp_str = existing_item.get('timestamp', '')
         else:
             timestamp_str = existing_item.get('timestamp', '')
         
@@ -266,142 +387,466 @@ def process_single_photo(photo_file, photos_base_dir, optimized_dir, max_size_kb
         ## Object detection ##
         ######################
         if run_object_detection:
-            if 'objects' in existing_item and existing_item.get('objects'):
-                logger.info(f"[{thread_id}] \tSkip object detection")
-                objects_str = existing_item['objects']
-            else:
-                objects = detect_object(photo_file, 'l', 640)
-                objects_str = ",".join(objects) if objects else "None"
-                logger.info(f"[{thread_id}] - Detected objects: {objects_str}")
+            try:
+                objects_str, hit = cache.get_or_compute(content_hash, 'objects', OBJECT_DETECTION_PARAMS,
+                                                        lambda: compute_objects(photo_file, frame, inference))
+                logger.info(f"[{thread_id}] - {'Cached' if hit else 'Detected'} objects: {objects_str}")
+                succeeded.append('objects')
+            except Exception as e:
+                logger.info(f"[{thread_id}] Error detecting objects for {photo_file.name}: {e}")
+                objects_str = existing_item.get('objects', '')
         else:
             objects_str = existing_item.get('objects', '')
 
+        city, country = parse_location(photo_file.stem)
         logger.info(f"[{thread_id}] {photo_file.name}\n - City: {city}, Country: {country}")
         
-        item = {
-            'title': photo_file.stem.replace('-', ' ').replace('_', ' '),
-            'image': {
-                'src': f"/assets/img/photos_optimized/{relative_path}",  # Preserves subdirectory structure
-                'alt': photo_file.stem.replace('-', ' ').replace('_', ' ')
-            },
-            'city': city,
-            'country': country,
-            'sentiment': sentiments_str,
-            'objects': objects_str,
-            'color': color_str,
-            'timestamp': timestamp_str,
-        }
-        
-        return item
+        item = build_photo_item(photo_file, optimized_relative, sentiments_str, objects_str, color_str, timestamp_str)
+        return item, content_hash, succeeded
         
     except Exception as e:
-        logger.error(f"[{threading.current_thread().name}] Error processing {photo_file}: {e}")
+        logger.error(f"[{_worker_name()}] Error processing {photo_file}: {e}")
         return None
 
+def record_photo(manifest, stats, relative_path, item, content_hash, analyzers):
+    """Record a merged photo in the manifest with the stat it was scanned with"""
+    rel_path = relative_path.as_posix()
+    manifest.record(rel_path, stats[rel_path], content_hash, optimized_relative_path(rel_path).as_posix(),
+                    item['title'], {name: ANALYZER_PARAMS[name] for name in analyzers})
+
+def save_checkpoint(store, manifest=None):
+    """Save photos.md, then the manifest, so the manifest never claims unsaved items"""
+    store.save()
+    if manifest is not None:
+        manifest.save(store.path)
+
+class _PhotoJob:
+    """One photo moving through the staged pipeline"""
+    
+    def __init__(self, photo_file, photos_base_dir, optimized_dir, index):
+        self.photo_file = photo_file
+        self.relative_path = photo_file.relative_to(photos_base_dir)
+        self.optimized_relative_path = optimized_relative_path(self.relative_path.as_posix())
+        self.optimized_path = optimized_dir / self.optimized_relative_path
+        self.index = index
+        self.reserved_bytes = 0  # Held in the memory budget from discover until merge
+        self.frame = None
+        self.content_hash = None
+        self.results = {}
+        self.pending = []
+        self.finished = set()  # Analyzers that have called finish()
+        self.remaining = 0
+        self.failed = False
+        self.lock = threading.Lock()
+
+def run_staged_pipeline(photo_files, photos_base_dir, optimized_dir, max_size_kb, existing_items, store, cache,
+                        inference, analyzers, num_workers=4, checkpoint_every=100, manifest=None, stats=None,
+                        budget=None):
+    """
+    Process photos as a streaming pipeline of stages connected by bounded queues:
+    
+        discover -> decode -> optimize/write -> one stage per analyzer -> merge
+    
+    Each stage has its own workers: I/O-heavy decode gets 2 * num_workers threads,
+    resize/encode and color clustering get num_workers (PIL, OpenCV and sklearn
+    release the GIL), and each model stage has a single consumer that batches
+    photos for CLIP and YOLO. Analyzers run side by side, so a slow YOLO call
+    doesn't hold up EXIF extraction, and bounded queues keep memory flat however
+    many photos are queued.
+    Cached analyzer results are looked up in the decode stage, and a photo whose
+    results are all cached and whose optimized file exists is never decoded.
+    Merged photos are recorded in the manifest, if given, with their scanned stats.
+    With a MemoryBudget, discover also waits until the photo's estimated bytes fit
+    in it; they are released when the photo reaches merge.
+    
+    Returns the number of photos merged into the store.
+    """
+    completed = [0]
+    if budget is None:
+        budget = MemoryBudget()
+    
+    def fail(job, error=None):
+        job.failed = True
+        job.frame = None
+        merge_stage.put(job)
+    
+    def dispatch(job):
+        if not job.pending:
+            job.frame = None
+            merge_stage.put(job)
+            return
+        job.remaining = len(job.pending)
+        for name in list(job.pending):
+            analyzer_stages[name].put(job)
+    
+    def finish(job, name, value, cache_it=True):
+        with job.lock:
+            # A batch handler that raises partway has its whole batch passed to
+            # on_error; jobs it already finished must not be counted twice
+            if name in job.finished:
+                return
+            job.finished.add(name)
+        try:
+            if value is not None:
+                job.results[name] = value
+                if cache_it:
+                    cache.put(job.content_hash, name, ANALYZER_PARAMS[name], value)
+        finally:
+            with job.lock:
+                job.remaining -= 1
+                done = job.remaining == 0
+        if done:
+            # Drop the decoded pixels as soon as the last analyzer is done
+            job.frame = None
+            merge_stage.put(job)
+    
+    def decode(job):
+        job.frame = PhotoFrame(job.photo_file)
+        job.content_hash = job.frame.content_hash
+        for name in analyzers:
+            value = cache.get(job.frame.content_hash, name, ANALYZER_PARAMS[name])
+            if value is None:
+                job.pending.append(name)
+            else:
+                job.results[name] = value
+        needs_optimize = not job.optimized_path.exists()
+        # Timestamps only need the EXIF header; anything else needs pixels
+        if needs_optimize or any(name != 'timestamp' for name in job.pending):
+            request_decode_sizes(job.frame, (['optimize'] if needs_optimize else []) + job.pending)
+            job.frame.image
+        if needs_optimize:
+            optimize_stage.put(job)
+        else:
+            dispatch(job)
+    
+    def optimize(job):
+        write_optimized_image(job.photo_file, job.frame, job.optimized_path, max_size_kb)
+        logger.info(f"[{threading.current_thread().name}] Saved optimized image to: {job.optimized_path}")
+        dispatch(job)
+    
+    def analyze_color(job):
+        try:
+            finish(job, 'color', compute_color(job.photo_file, job.frame))
+        except Exception as e:
+            logger.info(f"[{threading.current_thread().name}] Error analyzing color for {job.photo_file.name}: {e}")
+            finish(job, 'color', None, cache_it=False)
+    
+    def analyze_timestamp(job):
+        try:
+            finish(job, 'timestamp', compute_timestamp(job.photo_file, job.frame))
+        except Exception as e:
+            logger.info(f"[{threading.current_thread().name}] Error extracting timestamp for {job.photo_file.name}: {e}")
+            finish(job, 'timestamp', None, cache_it=False)
+    
+    def analyze_sentiment(jobs):
+        sentiment_lists = inference.analyze_sentiment_batch(
+            [job.photo_file for job in jobs], SENTIMENT_PARAMS['confidence_threshold'],
+            images=[job.frame.rgb_image for job in jobs]
+        )
+        for job, sentiment_list in zip(jobs, sentiment_lists):
+            if sentiment_list is None:
+                # Could not be analyzed: leave the field as it was, uncached
+                finish(job, 'sentiment', None, cache_it=False)
+            else:
+                finish(job, 'sentiment', format_sentiment(sentiment_list))
+    
+    def analyze_objects(jobs):
+        object_lists = inference.detect_objects_batch(
+            [job.frame.rgb_image for job in jobs], **OBJECT_DETECTION_PARAMS, batch=OBJECT_DETECTION_BATCH_SIZE,
+            backend=OBJECT_DETECTION_BACKEND
+        )
+        for job, objects in zip(jobs, object_lists):
+            finish(job, 'objects', format_objects(objects))
+    
+    def merge(job):
+        budget.release(job.reserved_bytes)
+        if job.failed:
+            return
+        existing_item = existing_items.get(photo_title(job.photo_file), {})
+        fields = {name: job.results.get(name, existing_item.get(name, '')) for name in ANALYZER_PARAMS}
+        fields['timestamp'] = merge_timestamp(fields['timestamp'], existing_item)
+        item = build_photo_item(job.photo_file, job.optimized_relative_path, **fields)
+        store.merge([item])
+        if manifest is not None:
+            record_photo(manifest, stats, job.relative_path, item, job.content_hash,
+                         [name for name in analyzers if name in job.results])
+        completed[0] += 1
+        logger.info(f"[merge] {completed[0]} done: {job.photo_file.name} ({job.index}/{len(photo_files)})")
+        # Checkpoint so an interrupted run keeps its progress
+        if completed[0] % checkpoint_every == 0:
+            save_checkpoint(store, manifest)
+    
+    def analyzer_failed(name):
+        # Leave the field as it was in photos.md, uncached, and keep the photo moving
+        return lambda job, error: finish(job, name, None, cache_it=False)
+    
+    merge_stage = Stage('merge', merge, workers=1, maxsize=64).start()
+    analyzer_handlers = {
+        'color': dict(handler=analyze_color, workers=num_workers),
+        'timestamp': dict(handler=analyze_timestamp, workers=2),
+        'sentiment': dict(handler=analyze_sentiment, workers=1, batch_size=16),
+        'objects': dict(handler=analyze_objects, workers=1, batch_size=OBJECT_DETECTION_BATCH_SIZE),
+    }
+    analyzer_stages = {
+        name: Stage(name, on_error=analyzer_failed(name), **analyzer_handlers[name]).start()
+        for name in analyzers
+    }
+    optimize_stage = Stage('optimize', optimize, workers=num_workers, on_error=fail).start()
+    decode_stage = Stage('decode', decode, workers=2 * num_workers, on_error=fail).start()
+    
+    try:
+        # Discover: feed photos in; put() blocks whenever the decode queue is full
+        for index, photo_file in enumerate(photo_files, 1):
+            job = _PhotoJob(photo_file, photos_base_dir, optimized_dir, index)
+            if budget.limit_bytes is not None:
+                job.reserved_bytes = estimate_photo_bytes(photo_file, pixel_consumers(job.optimized_path, analyzers))
+                budget.acquire(job.reserved_bytes)
+            decode_stage.put(job)
+        
+        # Close in pipeline order so every stage has drained before its consumers stop
+        for stage in [decode_stage, optimize_stage, *analyzer_stages.values(), merge_stage]:
+            stage.close()
+    finally:
+        save_checkpoint(store, manifest)
+    
+    return completed[0]
+
+def _worker_name():
+    process = multiprocessing.current_process()
+    if process.name != 'MainProcess':
+        return process.name
+    return threading.current_thread().name
+
+def _init_photo_worker(existing_items, run_sentiment_analysis, run_object_detection):
+    """ProcessPoolExecutor initializer: open the cache and load models once per worker process"""
+    _worker_state['existing_items'] = existing_items
+    _worker_state['cache'] = AnalysisCache()
+    _worker_state['inference'] = None
+    if run_sentiment_analysis or run_object_detection:
+        inference = get_inference_client()
+        models = []
+        if run_sentiment_analysis:
+            models.append('clip')
+        if run_object_detection:
+            models.append(f"yolo:{OBJECT_DETECTION_PARAMS['model_size']}:{OBJECT_DETECTION_BACKEND}")
+        inference.preload(models)
+        _worker_state['inference'] = inference
+
+def _process_photo_in_worker(photo_file, photos_base_dir, optimized_dir, max_size_kb,
+                             run_sentiment_analysis, run_color_analysis, run_object_detection, run_timestamp,
+                             processed_count, total_files):
+    """process_single_photo with the worker process's cache, models and existing items"""
+    return process_single_photo(
+        photo_file, photos_base_dir, optimized_dir, max_size_kb,
+        _worker_state['existing_items'], _worker_state['cache'], _worker_state['inference'],
+        run_sentiment_analysis, run_color_analysis, run_object_detection, run_timestamp,
+        processed_count, total_files
+    )
+
 def generate_photos_md(max_size_kb, run_sentiment_analysis=False, run_color_analysis=False, 
-                      run_object_detection=False, run_timestamp=False, num_workers=4):
+                      run_object_detection=False, run_timestamp=False, num_workers=4, executor='thread',
+                      cleanup_dry_run=False, rescan=False, memory_budget_mb=None):
+    """
+    Optimize every photo and update photos.md.
+    
+    executor='thread' runs photos on a thread pool in this process. executor='process'
+    runs them on a process pool, so the GIL-bound resize, JPEG encode and color
+    clustering use every core; each worker opens the cache and loads models once.
+    executor='pipeline' splits the work into stages with their own worker counts
+    (see run_staged_pipeline). In every mode results stream back here, and this
+    process is the only writer of photos.md.
+    
+    Only photos that changed since the last run are processed (see PhotoManifest);
+    rescan=True processes every photo again.
+    
+    With memory_budget_mb, a photo is only started once its estimated decoded size
+    fits in the budget next to the photos in flight (see MemoryBudget), instead of
+    submitting every photo up front. Peak RSS is logged at the end of the run.
+    """
+    if executor not in ('thread', 'process', 'pipeline'):
+        raise ValueError(f"Invalid executor '{executor}'. Choose from: 'thread', 'process', 'pipeline'")
+    
     # Path to your photos directory and optimized photos directory
     photos_dir = Path("assets/img/photos")
     optimized_dir = Path("assets/img/photos_optimized")
     logger.info(f"\nCreating optimized directory: {optimized_dir}")
     optimized_dir.mkdir(exist_ok=True)
-    cleanup_orphaned_optimized_files(photos_dir, optimized_dir)
+    cleanup_orphaned_optimized_files(photos_dir, optimized_dir, dry_run=cleanup_dry_run)
     
-    # Load existing photos.md to check for existing objects data
-    existing_items = {}
-    if os.path.exists('photos.md'):
-        try:
-            with open('photos.md', 'r', encoding='utf-8') as f:
-                content = f.read()
-                # Extract YAML front matter
-                if content.startswith('---'):
-                    yaml_end = content.find('---', 3)
-                    if yaml_end != -1:
-                        yaml_content = content[3:yaml_end]
-                        existing_data = yaml.safe_load(yaml_content)
-                        if existing_data and 'items' in existing_data:
-                            # Create a lookup dict by title for quick access
-                            for item in existing_data['items']:
-                                existing_items[item.get('title', '')] = item
-                            logger.info(f"Loaded {len(existing_items)} existing items from photos.md")
-        except Exception as e:
-            logger.info(f"Could not load existing photos.md: {e}")
+    # Diff the originals against the manifest by stat, so only new, modified and
+    # deleted photos (or ones missing an output) are scheduled
+    ts = time.perf_counter()
+    manifest = PhotoManifest()
+    stats = scan_tree(photos_dir, with_stat=True)
+    # A HEIC that was already converted to a JPEG next to it is covered by that JPEG
+    for rel_path in converted_heifs(stats):
+        del stats[rel_path]
+    analyzers = [name for name, enabled in [('sentiment', run_sentiment_analysis), ('color', run_color_analysis),
+                                            ('timestamp', run_timestamp), ('objects', run_object_detection)]
+                 if enabled]
+    changes = manifest.diff(photos_dir, stats, {name: ANALYZER_PARAMS[name] for name in analyzers},
+                            optimized=set(scan_tree(optimized_dir)))
+    photos_md_changed = manifest.photos_md_changed('photos.md')
+    logger.info(f"Manifest diff: {changes.summary()} ({time.perf_counter() - ts:.3f}s)")
     
-    # Valid image extensions
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.PNG'}
+    if not (changes or photos_md_changed or rescan):
+        manifest.save()
+        logger.info("\nNothing changed since the last run, photos.md is up to date.")
+        return
     
-    # Find all image files recursively
-    all_image_files = [
-        f for f in photos_dir.rglob("*") 
-        if f.is_file() and f.suffix.lower() in image_extensions
-    ]
+    # Load photos.md once; items are merged into this index and written at checkpoints
+    store = PhotosMdStore('photos.md')
+    existing_items = dict(store.items)
+    
+    # Drop items of deleted photos, unless another photo still produces the same title
+    removed_titles = set(manifest.forget(changes.deleted)) - manifest.titles()
+    store.remove(removed_titles)
+    
+    if rescan:
+        scheduled = sorted(stats)
+    else:
+        scheduled = changes.scheduled
+        if photos_md_changed:
+            # photos.md was edited or lost: also redo photos whose items are missing
+            missing = [rel_path for rel_path, entry in manifest.entries.items()
+                       if rel_path in stats and entry['outputs']['title'] not in store.items]
+            scheduled = sorted(set(scheduled) | set(missing))
+    all_image_files = [photos_dir / rel_path for rel_path in scheduled]
     
     total_files = len(all_image_files)
-    logger.info(f"Found {total_files} images to process recursively with {num_workers} workers")
+    logger.info(f"Scheduled {total_files} of {len(stats)} images with {num_workers} {executor} workers")
     
     # Process images in parallel
     completed_items = []
+    cache = None
+    budget = MemoryBudget(memory_budget_mb * 2**20 if memory_budget_mb else None)
     
-    with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="PhotoWorker") as executor:
-        # Submit all tasks
-        future_to_photo = {
-            executor.submit(
-                process_single_photo, 
-                photo_file, 
-                photos_dir,  # Pass base photos directory
-                optimized_dir, 
-                max_size_kb, 
-                existing_items,
-                run_sentiment_analysis, 
-                run_color_analysis, 
-                run_object_detection, 
-                run_timestamp,
-                i + 1,  # processed count
-                total_files
-            ): photo_file 
-            for i, photo_file in enumerate(all_image_files)
-        }
-        
-        # Collect results as they complete
-        batch_size = 10  # Update photos.md every 10 completed items
-        batch_items = []
+    if executor == 'pipeline':
+        cache = AnalysisCache()
+        inference = get_inference_client() if (run_sentiment_analysis or run_object_detection) else None
+        completed = run_staged_pipeline(all_image_files, photos_dir, optimized_dir, max_size_kb, existing_items,
+                                        store, cache, inference, analyzers, num_workers=num_workers,
+                                        manifest=manifest, stats=stats, budget=budget)
+        cache.close()
+        logger.info(f"\nFinished! photos.md has been updated with {completed} items using the staged pipeline.")
+        log_peak_memory(budget)
+        return
+    
+    if executor == 'process':
+        pool = ProcessPoolExecutor(
+            max_workers=num_workers,
+            initializer=_init_photo_worker,
+            initargs=(existing_items, run_sentiment_analysis, run_object_detection)
+        )
+        submit = lambda photo_file, i: pool.submit(
+            _process_photo_in_worker,
+            photo_file, photos_dir, optimized_dir, max_size_kb,
+            run_sentiment_analysis, run_color_analysis, run_object_detection, run_timestamp,
+            i + 1, total_files
+        )
+    else:
+        cache = AnalysisCache()
+        inference = get_inference_client() if (run_sentiment_analysis or run_object_detection) else None
+        pool = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="PhotoWorker")
+        submit = lambda photo_file, i: pool.submit(
+            process_single_photo, 
+            photo_file, 
+            photos_dir,  # Pass base photos directory
+            optimized_dir, 
+            max_size_kb, 
+            existing_items,
+            cache,
+            inference,
+            run_sentiment_analysis, 
+            run_color_analysis, 
+            run_object_detection, 
+            run_timestamp,
+            i + 1,  # processed count
+            total_files
+        )
+    
+    with pool:
+        future_to_photo = {}
+        checkpoint_every = 100  # Write photos.md every 100 completed items
         
-        for future in as_completed(future_to_photo):
-            photo_file = future_to_photo[future]
+        def collect(future):
+            photo_file, nbytes = future_to_photo.pop(future)
+            budget.release(nbytes)
             try:
-                item = future.result()
-                if item:
+                result = future.result()
+                if result:
+                    item, content_hash, succeeded = result
                     completed_items.append(item)
-                    batch_items.append(item)
+                    store.merge([item])
+                    record_photo(manifest, stats, photo_file.relative_to(photos_dir), item, content_hash, succeeded)
                     
-                    # Update photos.md in batches to reduce file I/O
-                    if len(batch_items) >= batch_size:
-                        update_photos_md_batch(batch_items)
-                        batch_items = []
+                    # Checkpoint so an interrupted run keeps its progress
+                    if len(completed_items) % checkpoint_every == 0:
+                        save_checkpoint(store, manifest)
                         
             except Exception as exc:
                 logger.error(f"Photo {photo_file} generated an exception: {exc}")
         
-        # Update remaining items
-        if batch_items:
-            update_photos_md_batch(batch_items)
+        try:
+            # Submit photos as the memory budget admits them (without a budget, all
+            # up front), collecting finished ones while waiting for room
+            for i, photo_file in enumerate(all_image_files):
+                nbytes = 0
+                if budget.limit_bytes is not None:
+                    optimized_path = optimized_dir / optimized_relative_path(photo_file.relative_to(photos_dir).as_posix())
+                    nbytes = estimate_photo_bytes(photo_file, pixel_consumers(optimized_path, analyzers))
+                while not budget.acquire(nbytes, block=False):
+                    done, _ = wait(future_to_photo, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+                future_to_photo[submit(photo_file, i)] = (photo_file, nbytes)
+            
+            # Collect the rest as they complete
+            for future in as_completed(list(future_to_photo)):
+                collect(future)
+        finally:
+            save_checkpoint(store, manifest)
+
+    if cache is not None:
+        cache.close()
 
-    logger.info(f"\nFinished! photos.md has been updated with {len(completed_items)} items using {num_workers} workers.")
+    logger.info(f"\nFinished! photos.md has been updated with {len(completed_items)} items using {num_workers} {executor} workers.")
+    log_peak_memory(budget, worker_processes=executor == 'process')
 
 if __name__ == "__main__":
-    max_size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 500
-    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    parser = argparse.ArgumentParser(description='Optimize photos and generate photos.md')
+    parser.add_argument('max_size_kb', type=int, nargs='?', default=500, help='Max size for optimized images in KB (default: 500)')
+    parser.add_argument('num_workers', type=int, nargs='?', default=4, help='Number of workers (default: 4)')
+    parser.add_argument('--executor', choices=['thread', 'process', 'pipeline'], default='thread',
+                        help='thread: one process, shared models; process: one process per worker, uses every core; '
+                             'pipeline: streaming stages with bounded queues (default: thread)')
+    parser.add_argument('--sentiment', action='store_true', help='Run CLIP sentiment analysis')
+    parser.add_argument('--color', action='store_true', help='Run color analysis')
+    parser.add_argument('--objects', action='store_true', help='Run YOLO object detection')
+    parser.add_argument('--timestamp', action='store_true', help='Extract EXIF timestamps')
+    parser.add_argument('--rescan', action='store_true', help='Ignore the manifest and process every photo')
+    parser.add_argument('--memory-budget-mb', type=int, default=None,
+                        help='Only start a photo while the estimated decoded size of the photos in flight fits in this many MB')
+    parser.add_argument('--cleanup-dry-run', action='store_true', help='Only report orphaned optimized files, do not delete them')
+    args = parser.parse_args()
+    
+    max_size_kb = args.max_size_kb
+    num_workers = args.num_workers
     
     logger.info(f"Max size for optimized images: {max_size_kb}KB")
-    logger.info(f"Using {num_workers} worker threads")
+    logger.info(f"Using {num_workers} worker {'processes' if args.executor == 'process' else 'threads'}")
     
     generate_photos_md(
         max_size_kb, 
-        run_sentiment_analysis=False, 
-        run_color_analysis=False, 
-        run_object_detection=False, 
-        run_timestamp=False,
-        num_workers=num_workers
+        run_sentiment_analysis=args.sentiment, 
+        run_color_analysis=args.color, 
+        run_object_detection=args.objects, 
+        run_timestamp=args.timestamp,
+        num_workers=num_workers,
+        executor=args.executor,
+        cleanup_dry_run=args.cleanup_dry_run,
+        rescan=args.rescan,
+        memory_budget_mb=args.memory_budget_mb
     )
     
     logger.info(f"Optimization done! Max size for optimized images: {max_size_kb}KB with {num_workers} workers")
\ No newline at end of file
@@ -3,15 +3,175 @@ from PIL.ExifTags import TAGS
 import os
 from datetime import datetime
 import argparse
+import csv
+import glob
+import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_timestamp(image_path, debug=False):
+from photo_files import scan_tree
+
+# Tag IDs looked up directly by the fast path
+TAG_DATETIME = 0x0132            # IFD0, last modified
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_EXIF_IFD = 0x8769            # Pointer from IFD0 to the Exif sub-IFD
+TAG_DATETIME_ORIGINAL = 0x9003   # Exif IFD, when the photo was taken
+TAG_DATETIME_DIGITIZED = 0x9004  # Exif IFD
+
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+
+def read_exif_segment(image_path):
+    """
+    Read only the raw EXIF (TIFF) block of a JPEG or PNG, without decoding pixels.
+    
+    Walks the JPEG markers up to the APP1 'Exif' segment (or the PNG chunks up to
+    eXIf) and stops at the image data. Returns the TIFF bytes, or None if the file
+    has no EXIF block or is another format.
+    """
+    with open(image_path, 'rb') as f:
+        signature = f.read(8)
+        if signature[:2] == b'\xff\xd8':
+            f.seek(2)
+            while True:
+                marker = f.read(4)
+                if len(marker) < 4 or marker[0] != 0xFF:
+                    return None
+                # Start of scan or end of image: no EXIF before the pixels
+                if marker[1] in (0xDA, 0xD9):
+                    return None
+                length = int.from_bytes(marker[2:4], 'big') - 2
+                if length < 0:
+                    return None
+                if marker[1] == 0xE1:
+                    segment = f.read(length)
+                    if segment[:6] == b'Exif\x00\x00':
+                        return segment[6:]
+                else:
+                    f.seek(length, 1)
+        elif signature == b'\x89PNG\r\n\x1a\n':
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                length = int.from_bytes(header[:4], 'big')
+                chunk_type = header[4:]
+                if chunk_type == b'eXIf':
+                    return f.read(length)
+                if chunk_type in (b'IDAT', b'IEND'):
+                    return None
+                f.seek(length + 4, 1)  # Chunk data and CRC
+    return None
+
+
+def _read_ifd(tiff, offset, byte_order, wanted):
+    """Return {tag: value} for the wanted tags of the IFD at offset; ASCII as str, LONG/SHORT as int"""
+    values = {}
+    count = int.from_bytes(tiff[offset:offset + 2], byte_order)
+    for i in range(count):
+        entry = offset + 2 + 12 * i
+        tag = int.from_bytes(tiff[entry:entry + 2], byte_order)
+        if tag not in wanted:
+            continue
+        value_type = int.from_bytes(tiff[entry + 2:entry + 4], byte_order)
+        value_count = int.from_bytes(tiff[entry + 4:entry + 8], byte_order)
+        size = _TIFF_TYPE_SIZES.get(value_type, 1) * value_count
+        if size <= 4:
+            raw = tiff[entry + 8:entry + 8 + size]
+        else:
+            value_offset = int.from_bytes(tiff[entry + 8:entry + 12], byte_order)
+            raw = tiff[value_offset:value_offset + size]
+        if value_type == 2:
+            values[tag] = raw.split(b'\x00', 1)[0].decode('ascii', 'replace')
+        elif value_type in (3, 4):
+            values[tag] = int.from_bytes(raw[:_TIFF_TYPE_SIZES[value_type]], byte_order)
+    return values
+
+
+def parse_exif_tags(tiff):
+    """
+    Look up DateTime, Make and Model in IFD0 and DateTimeOriginal/DateTimeDigitized
+    in the Exif sub-IFD of a raw TIFF block, by tag ID.
+    
+    Returns:
+        dict: {tag ID: value} for the tags present
+    """
+    byte_order = {b'II': 'little', b'MM': 'big'}.get(tiff[:2])
+    if byte_order is None or int.from_bytes(tiff[2:4], byte_order) != 42:
+        return {}
+    ifd0 = int.from_bytes(tiff[4:8], byte_order)
+    tags = _read_ifd(tiff, ifd0, byte_order, {TAG_DATETIME, TAG_MAKE, TAG_MODEL, TAG_EXIF_IFD})
+    exif_ifd = tags.pop(TAG_EXIF_IFD, None)
+    if exif_ifd:
+        tags.update(_read_ifd(tiff, exif_ifd, byte_order, {TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED}))
+    return tags
+
+
+def fast_parse_exif_datetime(datetime_str):
+    """
+    Parse the standard EXIF form 'YYYY:MM:DD HH:MM:SS' by fixed offsets.
+    Falls back to the parse_exif_datetime format cascade for anything else.
+    """
+    if datetime_str is None:
+        return None
+    datetime_str = str(datetime_str).strip()
+    if (len(datetime_str) == 19 and datetime_str[4] == ':' and datetime_str[7] == ':' and datetime_str[10] == ' '
+            and datetime_str[13] == ':' and datetime_str[16] == ':'):
+        try:
+            return datetime(int(datetime_str[0:4]), int(datetime_str[5:7]), int(datetime_str[8:10]),
+                            int(datetime_str[11:13]), int(datetime_str[14:16]), int(datetime_str[17:19]))
+        except ValueError:
+            pass  # e.g. '0000:00:00 00:00:00'
+    return parse_exif_datetime(datetime_str)
+
+
+def read_exif_tags(image_path=None, exif=None):
+    """The tags the fast path uses, from a file's EXIF segment or an already loaded Image.Exif"""
+    if exif is not None:
+        tags = {tag: exif[tag] for tag in (TAG_DATETIME, TAG_MAKE, TAG_MODEL) if tag in exif}
+        exif_ifd = exif.get_ifd(TAG_EXIF_IFD)
+        for tag in (TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED):
+            if tag in exif_ifd:
+                tags[tag] = exif_ifd[tag]
+        return tags
+    tiff = read_exif_segment(image_path)
+    return parse_exif_tags(tiff) if tiff else {}
+
+
+def timestamp_from_tags(tags):
+    """
+    Pick when the photo was taken: DateTimeOriginal, then DateTimeDigitized, then DateTime.
+    
+    Returns:
+        tuple: (datetime, source tag name), or (None, None)
+    """
+    for tag, source in ((TAG_DATETIME_ORIGINAL, 'DateTimeOriginal'),
+                        (TAG_DATETIME_DIGITIZED, 'DateTimeDigitized'),
+                        (TAG_DATETIME, 'DateTime')):
+        parsed = fast_parse_exif_datetime(tags.get(tag))
+        if parsed:
+            return parsed, source
+    return None, None
+
+
+def extract_timestamp(image_path, debug=False, exif=None, fast=True):
     """
     Extract timestamp information from image EXIF data.
     
+    The fast path reads only the EXIF segment and looks up DateTimeOriginal,
+    DateTimeDigitized and DateTime by tag ID. When none of them parses (or with
+    fast=False) every tag is scanned with PIL instead. With debug, the path and
+    tag the timestamp came from are printed, so a debug run reports the same
+    timestamp as a normal one.
+    
     Args:
         image_path (str): Path to the image file
         debug (bool): If True, print all EXIF data for debugging
+        exif (Image.Exif): Already loaded EXIF data; skips opening image_path
+        fast (bool): Try the tag-ID fast path first
     
     Returns:
         dict: Timestamp analysis results containing:
@@ -23,104 +183,121 @@ def extract_timestamp(image_path, debug=False):
             - all_exif_data: All EXIF data (if debug=True)
     """
     
+    if fast:
+        try:
+            timestamp, source = timestamp_from_tags(read_exif_tags(image_path, exif))
+            if timestamp:
+                if debug:
+                    print(f"Fast path: timestamp from {source}")
+                return timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        except Exception as e:
+            if debug:
+                print(f"Fast path failed: {e}")
+            # Malformed EXIF; let PIL have a go
+        if debug:
+            print("Fast path found no timestamp tag, scanning all tags with PIL")
+    
     try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
-        
-        # Open image and extract EXIF data
-        with Image.open(image_path) as image:
-            exif_data = image.getexif()
+        if exif is None:
+            # Check if file exists
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"Image file not found: {image_path}")
             
-            # Initialize result dictionary
-            result = {
-                'datetime_original': None,
-                'datetime_digitized': None,
-                'datetime_modified': None,
-                'camera_info': {},
-                'has_exif': bool(exif_data),
-                'all_timestamps': {},
-                'raw_timestamps': {}
-            }
+            # Open image and extract EXIF data
+            with Image.open(image_path) as image:
+                exif = image.getexif()
+        
+        exif_data = exif
+        
+        # Initialize result dictionary
+        result = {
+            'datetime_original': None,
+            'datetime_digitized': None,
+            'datetime_modified': None,
+            'camera_info': {},
+            'has_exif': bool(exif_data),
+            'all_timestamps': {},
+            'raw_timestamps': {}
+        }
+        
+        if debug:
+            result['all_exif_data'] = {}
+        
+        if not exif_data:
+            return result
+        
+        # Extract relevant EXIF fields
+        for tag_id, value in exif_data.items():
+            tag_name = TAGS.get(tag_id, f"Tag_{tag_id}")
             
             if debug:
-                result['all_exif_data'] = {}
-            
-            if not exif_data:
-                return result
-            
-            # Extract relevant EXIF fields
-            for tag_id, value in exif_data.items():
-                tag_name = TAGS.get(tag_id, f"Tag_{tag_id}")
-                
-                if debug:
-                    result['all_exif_data'][tag_name] = str(value)
-                
-                # Look for any field that might contain timestamp data
-                if any(keyword in tag_name.lower() for keyword in ['date', 'time']):
-                    result['raw_timestamps'][tag_name] = str(value)
-                    parsed_dt = parse_exif_datetime(str(value))
-                    if parsed_dt:
-                        result['all_timestamps'][tag_name] = parsed_dt
-                
-                # Extract standard timestamp fields
-                if tag_name == 'DateTime':
-                    result['datetime_modified'] = parse_exif_datetime(str(value))
-                elif tag_name == 'DateTimeOriginal':
-                    result['datetime_original'] = parse_exif_datetime(str(value))
-                elif tag_name == 'DateTimeDigitized':
-                    result['datetime_digitized'] = parse_exif_datetime(str(value))
-                
-                # Extract camera information
-                elif tag_name == 'Make':
-                    result['camera_info']['make'] = str(value).strip()
-                elif tag_name == 'Model':
-                    result['camera_info']['model'] = str(value).strip()
-                elif tag_name == 'Software':
-                    result['camera_info']['software'] = str(value).strip()
-            
-            # Also check for GPS timestamp
-            try:
-                gps_info = image.getexif().get_ifd(0x8825)  # GPS IFD
-                if gps_info:
-                    for tag_id, value in gps_info.items():
-                        tag_name = TAGS.get(tag_id, f"GPS_Tag_{tag_id}")
-                        if 'date' in tag_name.lower() or 'time' in tag_name.lower():
-                            result['raw_timestamps'][f"GPS_{tag_name}"] = str(value)
-                            if debug:
-                                result['all_exif_data'][f"GPS_{tag_name}"] = str(value)
-            except:
-                pass
-            
-            # Determine the primary timestamp (when photo was actually taken)
-            primary_timestamp = (result['datetime_original'] or 
-                               result['datetime_digitized'])
-                               # Removed datetime_modified from primary selection
-            
-            # If no standard timestamps found, try to use any timestamp we found
-            if not primary_timestamp and result['all_timestamps']:
-                # Prefer timestamps with 'original' or 'create' in the name
-                for name, timestamp in result['all_timestamps'].items():
-                    if any(keyword in name.lower() for keyword in ['original', 'create', 'capture']):
-                        primary_timestamp = timestamp
-                        break
-                
-                # If still no primary timestamp, use the first one found
-                if not primary_timestamp:
-                    primary_timestamp = next(iter(result['all_timestamps'].values()))
+                result['all_exif_data'][tag_name] = str(value)
             
-            result['primary_timestamp'] = primary_timestamp
+            # Look for any field that might contain timestamp data
+            if any(keyword in tag_name.lower() for keyword in ['date', 'time']):
+                result['raw_timestamps'][tag_name] = str(value)
+                parsed_dt = parse_exif_datetime(str(value))
+                if parsed_dt:
+                    result['all_timestamps'][tag_name] = parsed_dt
             
-            # Add formatted timestamp strings
-            if primary_timestamp:
-                result['formatted_timestamp'] = primary_timestamp.strftime('%Y-%m-%d %H:%M:%S')
-                result['date_only'] = primary_timestamp.strftime('%Y-%m-%d')
-                result['time_only'] = primary_timestamp.strftime('%H:%M:%S')
-                result['human_readable'] = primary_timestamp.strftime('%B %d, %Y at %I:%M %p')
-                return result['formatted_timestamp']  # Return just the formatted timestamp
+            # Extract standard timestamp fields
+            if tag_name == 'DateTime':
+                result['datetime_modified'] = parse_exif_datetime(str(value))
+            elif tag_name == 'DateTimeOriginal':
+                result['datetime_original'] = parse_exif_datetime(str(value))
+            elif tag_name == 'DateTimeDigitized':
+                result['datetime_digitized'] = parse_exif_datetime(str(value))
             
-            return None  # Return None if no timestamp found
+            # Extract camera information
+            elif tag_name == 'Make':
+                result['camera_info']['make'] = str(value).strip()
+            elif tag_name == 'Model':
+                result['camera_info']['model'] = str(value).strip()
+            elif tag_name == 'Software':
+                result['camera_info']['software'] = str(value).strip()
+        
+        # Also check for GPS timestamp
+        try:
+            gps_info = exif_data.get_ifd(0x8825)  # GPS IFD
+            if gps_info:
+                for tag_id, value in gps_info.items():
+                    tag_name = TAGS.get(tag_id, f"GPS_Tag_{tag_id}")
+                    if 'date' in tag_name.lower() or 'time' in tag_name.lower():
+                        result['raw_timestamps'][f"GPS_{tag_name}"] = str(value)
+                        if debug:
+                            result['all_exif_data'][f"GPS_{tag_name}"] = str(value)
+        except:
+            pass
+        
+        # Determine the primary timestamp (when photo was actually taken)
+        primary_timestamp = (result['datetime_original'] or 
+                           result['datetime_digitized'])
+                           # Removed datetime_modified from primary selection
+        
+        # If no standard timestamps found, try to use any timestamp we found
+        if not primary_timestamp and result['all_timestamps']:
+            # Prefer timestamps with 'original' or 'create' in the name
+            for name, timestamp in result['all_timestamps'].items():
+                if any(keyword in name.lower() for keyword in ['original', 'create', 'capture']):
+                    primary_timestamp = timestamp
+                    break
             
+            # If still no primary timestamp, use the first one found
+            if not primary_timestamp:
+                primary_timestamp = next(iter(result['all_timestamps'].values()))
+        
+        result['primary_timestamp'] = primary_timestamp
+        
+        # Add formatted timestamp strings
+        if primary_timestamp:
+            result['formatted_timestamp'] = primary_timestamp.strftime('%Y-%m-%d %H:%M:%S')
+            result['date_only'] = primary_timestamp.strftime('%Y-%m-%d')
+            result['time_only'] = primary_timestamp.strftime('%H:%M:%S')
+            result['human_readable'] = primary_timestamp.strftime('%B %d, %Y at %I:%M %p')
+            return result['formatted_timestamp']  # Return just the formatted timestamp
+        
+        return None  # Return None if no timestamp found
+        
     except Exception as e:
         return None
 
@@ -265,20 +442,160 @@ def print_timestamp_results(result, image_path):
             print(f"File modification time (fallback): {file_mod_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
 
+DEFAULT_TIMESTAMP_INDEX = '.photo_cache/timestamps.jsonl'
+BULK_FIELDS = ['path', 'timestamp', 'make', 'model', 'source']
+
+_timestamp_index = None
+_timestamp_index_lock = threading.Lock()
+
+
+def scan_timestamp(image_path):
+    """
+    Timestamp and camera of one file, for bulk scans.
+    
+    Returns:
+        dict: path, timestamp ('YYYY-MM-DD HH:MM:SS' or None), make, model, and
+              source: the tag the timestamp came from, 'scan' if only the full
+              PIL tag scan found one, or None
+    """
+    record = {'path': str(image_path), 'timestamp': None, 'make': None, 'model': None, 'source': None}
+    try:
+        tags = read_exif_tags(image_path)
+        record['make'] = str(tags[TAG_MAKE]).strip() if TAG_MAKE in tags else None
+        record['model'] = str(tags[TAG_MODEL]).strip() if TAG_MODEL in tags else None
+        timestamp, source = timestamp_from_tags(tags)
+    except Exception:
+        timestamp, source = None, None
+    if timestamp:
+        record['timestamp'], record['source'] = timestamp.strftime('%Y-%m-%d %H:%M:%S'), source
+    else:
+        timestamp = extract_timestamp(image_path, fast=False)
+        if isinstance(timestamp, str):
+            record['timestamp'], record['source'] = timestamp, 'scan'
+    return record
+
+
+def find_images(path_or_glob):
+    """Image files under a directory (recursively) or matching a glob pattern, sorted"""
+    if os.path.isdir(path_or_glob):
+        return sorted(os.path.join(path_or_glob, rel_path) for rel_path in scan_tree(path_or_glob))
+    return sorted(path for path in glob.glob(path_or_glob, recursive=True) if os.path.isfile(path))
+
+
+def scan_timestamps(image_paths, workers=8):
+    """Yield scan_timestamp records in input order, reading headers on a thread pool (the work is I/O-bound)"""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ExifReader") as pool:
+        yield from pool.map(scan_timestamp, image_paths)
+
+
+def write_timestamp_index(records, index_path=DEFAULT_TIMESTAMP_INDEX):
+    """
+    Write records as a JSONL sidecar index, with each file's size and mtime_ns
+    so readers can tell when an entry is stale, and its resolved path so lookups
+    match however the root was spelled. Written via a temp file and rename.
+    """
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(index_path), f".{os.path.basename(index_path)}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for record in records:
+            stat = os.stat(record['path'])
+            f.write(json.dumps({**record, 'resolved_path': os.path.realpath(record['path']),
+                                'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}) + '\n')
+    os.replace(tmp_path, index_path)
+
+
+def load_timestamp_index_once(index_path=DEFAULT_TIMESTAMP_INDEX):
+    """Load the sidecar index once per process; {resolved path: record}, empty if there is no index"""
+    global _timestamp_index
+    with _timestamp_index_lock:
+        if _timestamp_index is None:
+            _timestamp_index = {}
+            if os.path.exists(index_path):
+                with open(index_path, encoding='utf-8') as f:
+                    for line in f:
+                        record = json.loads(line)
+                        # Indexes written before resolved_path was added are resolved
+                        # against the current directory, as their paths were written
+                        _timestamp_index[record.get('resolved_path') or os.path.realpath(record['path'])] = record
+        return _timestamp_index
+
+
+def lookup_indexed_timestamp(image_path, index_path=DEFAULT_TIMESTAMP_INDEX):
+    """
+    The timestamp recorded for image_path in the sidecar index ('' if it has
+    none), or None if the file is not indexed or changed since it was indexed.
+    """
+    record = load_timestamp_index_once(index_path).get(os.path.realpath(image_path))
+    if record is None:
+        return None
+    try:
+        stat = os.stat(image_path)
+    except FileNotFoundError:
+        return None
+    if (stat.st_size, stat.st_mtime_ns) != (record['size'], record['mtime_ns']):
+        return None
+    return record['timestamp'] or ''
+
+
+def run_bulk(path_or_glob, output_format='jsonl', workers=8, index_path=None):
+    """Stream one record per image to stdout as JSONL or CSV, optionally writing the sidecar index"""
+    image_paths = find_images(path_or_glob)
+    ts = time.perf_counter()
+    
+    writer = None
+    if output_format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=BULK_FIELDS)
+        writer.writeheader()
+    
+    records = []
+    for record in scan_timestamps(image_paths, workers):
+        if writer:
+            writer.writerow(record)
+        else:
+            sys.stdout.write(json.dumps(record) + '\n')
+        if index_path:
+            records.append(record)
+    sys.stdout.flush()
+    
+    if index_path:
+        write_timestamp_index(records, index_path)
+    
+    elapsed = time.perf_counter() - ts
+    found = sum(record['timestamp'] is not None for record in records) if index_path else None
+    print(f"Scanned {len(image_paths)} images in {elapsed:.2f}s ({len(image_paths) / max(elapsed, 1e-9):.0f}/s) "
+          f"with {workers} workers" + (f", wrote {index_path} ({found} with timestamps)" if index_path else ""),
+          file=sys.stderr)
+
+
 def main():
     """Main function to handle command line arguments and execute timestamp extraction."""
     parser = argparse.ArgumentParser(description='Extract timestamp information from image EXIF data')
-    parser.add_argument('image_path', help='Path to the image file')
+    parser.add_argument('image_path', help='Path to the image file, or a directory or glob for bulk mode')
     parser.add_argument('--json', action='store_true', help='Output results in JSON format')
     parser.add_argument('--debug', action='store_true', help='Show all EXIF data for debugging')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='Bulk mode output format (default: jsonl)')
+    parser.add_argument('--workers', type=int, default=8, help='Bulk mode reader threads (default: 8)')
+    parser.add_argument('--index', nargs='?', const=DEFAULT_TIMESTAMP_INDEX, default=None,
+                        help=f'Bulk mode: also write a sidecar index (default path: {DEFAULT_TIMESTAMP_INDEX})')
     
     args = parser.parse_args()
     
+    if not os.path.isfile(args.image_path) and (os.path.isdir(args.image_path) or glob.has_magic(args.image_path)):
+        run_bulk(args.image_path, args.format, args.workers, args.index)
+        return
+    
     # Extract timestamp information
     result = extract_timestamp(args.image_path, debug=args.debug)
-    
+
+    # A found timestamp comes back as a formatted string; only a miss returns the full dict
+    if isinstance(result, str):
+        if args.json:
+            print(json.dumps({'primary_timestamp': result}, indent=2))
+        else:
+            print(f"Timestamp for {os.path.basename(args.image_path)}: {result}")
+        return
+
     if args.json:
-        import json
         # Convert datetime objects to strings for JSON serialization
         json_result = result.copy()
         for key in ['datetime_original', 'datetime_digitized', 'datetime_modified', 'primary_timestamp']:
@@ -303,6 +620,8 @@ if __name__ == "__main__":
     else:
         # Example usage for testing
         print("Usage: python script.py <image_path> [--debug] [--json]")
+        print("       python script.py <directory|glob> [--format jsonl|csv] [--workers 8] [--index [path]]")
         print("Example: python script.py photo.jpg")
+        print("Example: python script.py assets/img/photos --index > timestamps.jsonl")
         print("  --debug: Show all EXIF data for debugging")
         print("  --json: Output in JSON format")
\ No newline at end of file
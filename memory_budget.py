@@ -0,0 +1,55 @@
+import resource
+import sys
+import threading
+
+
+class MemoryBudget:
+    """
+    Admission control for decoded images: callers acquire() an estimate of the
+    bytes a photo will hold before starting it and release() it when the photo's
+    pixels are dropped.
+
+    A photo is admitted while the bytes in flight plus its estimate fit in the
+    budget. A photo larger than the whole budget is still admitted once nothing
+    else is in flight, so it runs alone instead of never. limit_bytes=None admits
+    everything.
+    """
+
+    def __init__(self, limit_bytes=None):
+        self.limit_bytes = limit_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0  # Times a photo did not fit and had to wait
+        self._condition = threading.Condition()
+
+    def _fits(self, nbytes):
+        return self.limit_bytes is None or self.in_use == 0 or self.in_use + nbytes <= self.limit_bytes
+
+    def acquire(self, nbytes, block=True):
+        """Reserve nbytes; with block=False, return False instead of waiting when it does not fit"""
+        with self._condition:
+            if not self._fits(nbytes):
+                self.waits += 1
+                if not block:
+                    return False
+                self._condition.wait_for(lambda: self._fits(nbytes))
+            self.in_use += nbytes
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def release(self, nbytes):
+        with self._condition:
+            self.in_use -= nbytes
+            self._condition.notify_all()
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size in MB, as (this process, largest waited-for child).
+    Children are the workers of a process pool once it has been shut down.
+    """
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+    return own, children
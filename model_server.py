@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Long-lived local inference worker for YOLO, CLIP and BLIP.
+
+Loading the models dominates per-photo latency, so this process loads each model
+once, keeps it warm and answers requests over a local socket. The photo scripts
+and the analyzer CLIs call get_inference_client(), which talks to a running
+server and falls back to in-process inference (models still loaded once per
+process) when none is listening.
+
+Usage:
+    python model_server.py [--host 127.0.0.1] [--port 6007] [--preload yolo:l[:onnx] clip blip:base]
+
+Set PHOTO_MODEL_SERVER=host:port to point clients at a non-default address.
+
+Requests are pickled, so connections are authenticated with a random key that
+the server creates on first start in ~/.photo_model_server_key (mode 0600).
+Clients read the same file; without it they run inference in-process. A client
+on another host needs a copy of the key.
+"""
+
+import argparse
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+import logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = ('127.0.0.1', 6007)
+AUTHKEY_PATH = Path.home() / '.photo_model_server_key'
+
+
+def load_authkey(create=False):
+    """
+    The key shared by the server and its clients, from AUTHKEY_PATH. The server
+    creates it (create=True); for clients a missing file returns None. A key file
+    that other users can read is refused, since the key lets anyone who has it
+    send the server pickles.
+    """
+    try:
+        fd = os.open(AUTHKEY_PATH, os.O_RDONLY)
+    except FileNotFoundError:
+        if not create:
+            return None
+        try:
+            fd = os.open(AUTHKEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            # Another server created it first
+            return load_authkey()
+        key = secrets.token_hex(32).encode()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        logger.info(f"Created model server key {AUTHKEY_PATH}")
+        return key
+    with os.fdopen(fd, 'rb') as f:
+        if os.fstat(f.fileno()).st_mode & 0o077:
+            raise PermissionError(f"{AUTHKEY_PATH} is readable by other users; run: chmod 600 {AUTHKEY_PATH}")
+        return f.read().strip()
+
+
+def get_server_address():
+    """Address from PHOTO_MODEL_SERVER (host:port), or the default"""
+    value = os.environ.get('PHOTO_MODEL_SERVER')
+    if not value:
+        return DEFAULT_ADDRESS
+    host, port = value.rsplit(':', 1)
+    return (host, int(port))
+
+
+class LocalInference:
+    """Runs inference in this process. Analyzer modules are imported on first use"""
+
+    def detect_object(self, input_path, model_size, image_size=640, image=None, backend='torch',
+                      min_confidence=0.25, top_k=None):
+        from object_detection import detect_object
+        return detect_object(input_path, model_size, image_size, image=image, backend=backend,
+                             min_confidence=min_confidence, top_k=top_k)
+
+    def detect_objects_batch(self, inputs, model_size, image_size=640, batch=8, backend='torch',
+                             min_confidence=0.25, top_k=None):
+        """Batched detect_object; one per-class summary (or None) per input, in input order"""
+        from object_detection import detect_objects_batch
+        return detect_objects_batch(inputs, model_size, image_size, batch=batch, backend=backend,
+                                    min_confidence=min_confidence, top_k=top_k)
+
+    def describe_image(self, image_path, model_size='base', image=None, num_beams=5, max_length=100, bfloat16=False):
+        from image_description import describe_image
+        return describe_image(image_path, model_size, image=image, num_beams=num_beams, max_length=max_length,
+                              bfloat16=bfloat16)
+
+    def describe_images(self, image_paths, model_size='base', batch_size=8, images=None, num_beams=5, max_length=100,
+                        bfloat16=False):
+        """Batched describe_image; one caption per image, in input order"""
+        from image_description import describe_images
+        return describe_images(image_paths, model_size, batch_size, images=images, num_beams=num_beams,
+                               max_length=max_length, bfloat16=bfloat16)
+
+    def analyze_sentiment(self, image_path, confidence_threshold, image=None):
+        from sentiment_analysis import analyze_single_image
+        return analyze_single_image(image_path, confidence_threshold, image=image)
+
+    def analyze_sentiment_batch(self, image_paths, confidence_threshold, images=None, batch_size=16,
+                                with_scores=False):
+        """
+        Batched analyze_sentiment, in input order: per image a list of adjectives ([] if
+        none is confident), or None if the image could not be analyzed. with_scores
+        gives (adjective, similarity) pairs instead of adjectives.
+        """
+        from sentiment_analysis import get_sentiment_analyzer
+        results = get_sentiment_analyzer().analyze_sentiment_batch(
+            image_paths, top_k=3, confidence_threshold=confidence_threshold, batch_size=batch_size, images=images
+        )
+        return [None if sentiments is None else [] if sentiments[0][0] == 'uncertain'
+                else [(sentiment, float(score)) if with_scores else sentiment for sentiment, score in sentiments]
+                for sentiments in results]
+
+    def preload(self, models):
+        """Load models ahead of the first request, e.g. ['yolo:l', 'yolo:l:onnx', 'clip', 'blip:base']"""
+        for spec in models:
+            name, _, size = spec.partition(':')
+            if name == 'yolo':
+                from object_detection import load_yolo_model_once
+                size, _, backend = size.partition(':')
+                load_yolo_model_once(size or 'l', backend or 'torch')
+            elif name == 'clip':
+                from sentiment_analysis import load_clip_model_once
+                load_clip_model_once()
+            elif name == 'blip':
+                from image_description import load_blip_model_once
+                load_blip_model_once(size or 'base')
+            else:
+                raise ValueError(f"Unknown model '{spec}'. Choose from: yolo[:size[:backend]], clip, blip[:size]")
+
+    def ping(self):
+        return os.getpid()
+
+
+class ModelServerClient:
+    """Same interface as LocalInference, but forwards every call to the model server.
+
+    Each thread gets its own connection, so the client can be shared by a thread pool.
+    """
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or get_server_address()
+        self.authkey = authkey or load_authkey()
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, method, *args, **kwargs):
+        conn = self._connection()
+        conn.send((method, args, kwargs))
+        status, value = conn.recv()
+        if status == 'error':
+            raise value
+        return value
+
+    def detect_object(self, input_path, model_size, image_size=640, image=None, backend='torch',
+                      min_confidence=0.25, top_k=None):
+        return self._call('detect_object', input_path, model_size, image_size, image=image, backend=backend,
+                          min_confidence=min_confidence, top_k=top_k)
+
+    def detect_objects_batch(self, inputs, model_size, image_size=640, batch=8, backend='torch',
+                             min_confidence=0.25, top_k=None):
+        return self._call('detect_objects_batch', inputs, model_size, image_size, batch=batch, backend=backend,
+                          min_confidence=min_confidence, top_k=top_k)
+
+    def describe_image(self, image_path, model_size='base', image=None, num_beams=5, max_length=100, bfloat16=False):
+        return self._call('describe_image', image_path, model_size, image=image, num_beams=num_beams,
+                          max_length=max_length, bfloat16=bfloat16)
+
+    def describe_images(self, image_paths, model_size='base', batch_size=8, images=None, num_beams=5, max_length=100,
+                        bfloat16=False):
+        return self._call('describe_images', image_paths, model_size, batch_size, images=images, num_beams=num_beams,
+                          max_length=max_length, bfloat16=bfloat16)
+
+    def analyze_sentiment(self, image_path, confidence_threshold, image=None):
+        return self._call('analyze_sentiment', image_path, confidence_threshold, image=image)
+
+    def analyze_sentiment_batch(self, image_paths, confidence_threshold, images=None, batch_size=16,
+                                with_scores=False):
+        return self._call('analyze_sentiment_batch', image_paths, confidence_threshold, images=images, batch_size=batch_size,
+                          with_scores=with_scores)
+
+    def preload(self, models):
+        return self._call('preload', list(models))
+
+    def ping(self):
+        return self._call('ping')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def get_inference_client(address=None):
+    """Return a client for a running model server, or in-process inference if none answers"""
+    authkey = load_authkey()
+    if authkey is None:
+        logger.info("No model server key, loading models in this process")
+        return LocalInference()
+    client = ModelServerClient(address, authkey)
+    try:
+        pid = client.ping()
+        logger.info(f"Using model server at {client.address[0]}:{client.address[1]} (pid {pid})")
+        return client
+    except (OSError, EOFError, AuthenticationError):
+        logger.info("No model server running, loading models in this process")
+        return LocalInference()
+
+
+def _handle_connection(conn, inference):
+    with conn:
+        while True:
+            try:
+                method, args, kwargs = conn.recv()
+            except (EOFError, OSError):
+                return
+
+            try:
+                if method.startswith('_') or not hasattr(inference, method):
+                    raise ValueError(f"Unknown model server method '{method}'")
+                ts = time.time()
+                value = getattr(inference, method)(*args, **kwargs)
+                if method != 'ping':
+                    logger.info(f"{method}: {time.time() - ts:.2f}s")
+                reply = ('ok', value)
+            except Exception as e:
+                logger.info(f"{method} failed: {e}")
+                reply = ('error', e)
+
+            try:
+                conn.send(reply)
+            except Exception as e:
+                # The exception (or result) did not pickle; report it as text
+                conn.send(('error', RuntimeError(f"{method} failed: {reply[1]!r} ({e})")))
+
+
+def serve(address=None, preload=()):
+    """Accept connections until interrupted; one handler thread per connection"""
+    address = address or get_server_address()
+    inference = LocalInference()
+    if preload:
+        logger.info(f"Preloading models: {', '.join(preload)}")
+        inference.preload(preload)
+
+    authkey = load_authkey(create=True)
+    with Listener(address, authkey=authkey) as listener:
+        logger.info(f"Model server listening on {address[0]}:{address[1]} (pid {os.getpid()})")
+        while True:
+            try:
+                conn = listener.accept()
+            except KeyboardInterrupt:
+                logger.info("Shutting down model server")
+                return
+            except Exception as e:
+                # e.g. a client with the wrong authkey
+                logger.info(f"Rejected connection: {e}")
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, inference), daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve YOLO, CLIP and BLIP inference from one warm process')
+    parser.add_argument('--host', default=None, help=f'Bind address (default: {DEFAULT_ADDRESS[0]})')
+    parser.add_argument('--port', type=int, default=None, help=f'Port (default: {DEFAULT_ADDRESS[1]})')
+    parser.add_argument('--preload', nargs='*', default=[], help="Models to load at startup, e.g. yolo:l yolo:l:onnx clip blip:base")
+    args = parser.parse_args()
+
+    host, port = get_server_address()
+    serve((args.host or host, args.port or port), preload=args.preload)
+
+
+if __name__ == "__main__":
+    main()
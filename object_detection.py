@@ -1,65 +1,168 @@
 from ultralytics import YOLO
 import sys
+import threading
 from pathlib import Path
 
-def detect_object(input_path, model_size, image_size=640, show_image=False):
+_yolo_models = {}
+_yolo_lock = threading.Lock()
+# Ultralytics predictors are not thread-safe; one lock per loaded model serializes its calls
+_yolo_inference_locks = {}
+
+MODEL_FILES = {
+    'n': 'yolo11n.pt',
+    's': 'yolo11s.pt',
+    'm': 'yolo11m.pt',
+    'l': 'yolo11l.pt',
+    'x': 'yolo11x.pt'
+}
+
+# backend -> (ultralytics export format, extra export args, exported file name next to the .pt)
+# 'torch' runs the .pt weights directly and stays the reference.
+BACKENDS = {
+    'torch': None,
+    'onnx': ('onnx', {}, '{stem}.onnx'),
+    'openvino': ('openvino', {}, '{stem}_openvino_model'),
+    'openvino-int8': ('openvino', {'int8': True}, '{stem}_int8_openvino_model'),
+}
+
+def _export_yolo_model(torch_model, backend):
+    """Export the .pt model for a CPU runtime once; the export is cached next to the .pt file"""
+    export_format, export_args, file_pattern = BACKENDS[backend]
+    pt_path = Path(getattr(torch_model, 'ckpt_path', None) or torch_model.model_name)
+    exported_path = pt_path.with_name(file_pattern.format(stem=pt_path.stem))
+    if not exported_path.exists():
+        # dynamic=True keeps batch size and image size free, like the .pt model
+        exported_path = Path(torch_model.export(format=export_format, dynamic=True, **export_args))
+    return exported_path
+
+def load_yolo_model_once(model_size, backend='torch'):
+    """Load a YOLO model only once per size and backend and keep it for the life of the process"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend '{backend}'. Choose from: {', '.join(BACKENDS)}.")
+    with _yolo_lock:
+        if (model_size, backend) not in _yolo_models:
+            if (model_size, 'torch') not in _yolo_models:
+                _yolo_models[(model_size, 'torch')] = YOLO(MODEL_FILES[model_size])
+                _yolo_inference_locks[(model_size, 'torch')] = threading.Lock()
+            if backend != 'torch':
+                exported_path = _export_yolo_model(_yolo_models[(model_size, 'torch')], backend)
+                _yolo_models[(model_size, backend)] = YOLO(str(exported_path), task='detect')
+                _yolo_inference_locks[(model_size, backend)] = threading.Lock()
+        return _yolo_models[(model_size, backend)]
+
+def _run_yolo(model_size, backend, source, **kwargs):
+    """Run the shared model for (model_size, backend) on source, one call at a time"""
+    model = load_yolo_model_once(model_size, backend)
+    with _yolo_inference_locks[(model_size, backend)]:
+        return model(source, **kwargs)
+
+SUPPORTED_EXTENSIONS = ['jpg', 'jpeg', 'png', 'bmp', 'tiff']
+DEFAULT_MIN_CONFIDENCE = 0.25
+
+def _check_model_size(model_size):
     if model_size not in ['n', 's', 'm', 'l', 'x']:
         raise ValueError("Invalid model size. Choose from: 'n', 's', 'm', 'l', 'x'.")
+
+def _objects_from_result(result, min_confidence=DEFAULT_MIN_CONFIDENCE, top_k=None):
+    """
+    Summarize one ultralytics result per class.
+    
+    Returns:
+        dict: {class name: {'count': boxes, 'confidence': max confidence}} for boxes at
+              or above min_confidence, most frequent (then most confident) class first
+              and at most top_k classes, or None if nothing was detected
+    """
+    objects = {}
+    for box in result.boxes:
+        confidence = float(box.conf[0])
+        if confidence < min_confidence:
+            continue
+        class_name = result.names[int(box.cls[0])]
+        summary = objects.setdefault(class_name, {'count': 0, 'confidence': 0.0})
+        summary['count'] += 1
+        summary['confidence'] = max(summary['confidence'], round(confidence, 3))
+    
+    if not objects:
+        return None
+    ranked = sorted(objects.items(), key=lambda item: (-item[1]['count'], -item[1]['confidence']))
+    return dict(ranked[:top_k])
+
+def detect_object(input_path, model_size, image_size=640, show_image=False, image=None, backend='torch',
+                  min_confidence=DEFAULT_MIN_CONFIDENCE, top_k=None):
+    """Detect objects in input_path. Pass an already decoded PIL image to skip reading the file again.
+    
+    Returns {class name: {'count', 'confidence'}} for the top_k classes with boxes at
+    or above min_confidence (see _objects_from_result), or None if there are none.
+    backend selects the runtime: 'torch' (the .pt weights), 'onnx', 'openvino' or
+    'openvino-int8'; the non-torch backends are exported on first use."""
+    _check_model_size(model_size)
     if not input_path:
         raise ValueError("Input path cannot be empty.")
     
     # Convert Path object to string if necessary
     input_path_str = str(input_path)
     
-    # Check file extension
-    if input_path_str.split('.')[-1].lower() not in ['jpg', 'jpeg', 'png', 'bmp', 'tiff']:
+    # Check file extension (a decoded image can come from any format, e.g. HEIC)
+    if image is None and input_path_str.split('.')[-1].lower() not in SUPPORTED_EXTENSIONS:
         return f"Skip processing, unsupported file format. {input_path_str}"
     
-    # Load model based on size
-    model_files = {
-        'n': 'yolo11n.pt',
-        's': 'yolo11s.pt',
-        'm': 'yolo11m.pt',
-        'l': 'yolo11l.pt',
-        'x': 'yolo11x.pt'
-    }
-    
-    model = YOLO(model_files[model_size])
-    results = model(input_path_str, imgsz=image_size)
+    results = _run_yolo(model_size, backend, image if image is not None else input_path_str,
+                        imgsz=image_size, conf=min_confidence, verbose=False)
     
     if show_image:
         results[0].show()
     
-    detection_strings = []
-    objects = []
-    for result in results:
-        for box in result.boxes:
-            # Get class name, confidence, and bounding box coordinates
-            class_id = int(box.cls[0])
-            class_name = result.names[class_id]
-            confidence = float(box.conf[0])
-            x1, y1, x2, y2 = box.xyxy[0].tolist()
-            
-            detection_str = {'object':class_name, 'confidence':confidence}
-            detection_strings.append(detection_str)
-            objects.append(class_name)
+    return _objects_from_result(results[0], min_confidence, top_k)
+
+def detect_objects_batch(inputs, model_size, image_size=640, batch=8, backend='torch',
+                         min_confidence=DEFAULT_MIN_CONFIDENCE, top_k=None):
+    """
+    Detect objects in many images with one loaded model, batch images per forward pass.
     
-    print(f"detection result: {detection_strings}")
-    if detection_strings:
-        return objects
-    else:
-        return None
+    inputs may mix file paths, PIL images and numpy arrays (BGR, as cv2.imread
+    returns them). Each chunk of `batch` images is letterboxed to image_size and
+    run as one batch. Returns one result per input, in input order: the per-class
+    summary detect_object returns, or None if nothing was detected or the file
+    format is unsupported. backend, min_confidence and top_k are as for detect_object.
+    """
+    _check_model_size(model_size)
+    if batch < 1:
+        raise ValueError("Batch size must be at least 1.")
+    
+    results = [None] * len(inputs)
+    sources = []
+    for index, item in enumerate(inputs):
+        if isinstance(item, (str, Path)):
+            if str(item).split('.')[-1].lower() not in SUPPORTED_EXTENSIONS:
+                continue
+            item = str(item)
+        sources.append((index, item))
+    
+    for start in range(0, len(sources), batch):
+        chunk = sources[start:start + batch]
+        # ultralytics runs a list source as a single batch, letterboxing every image to imgsz
+        chunk_results = _run_yolo(model_size, backend, [item for _, item in chunk],
+                                  imgsz=image_size, conf=min_confidence, verbose=False)
+        for (index, _), result in zip(chunk, chunk_results):
+            results[index] = _objects_from_result(result, min_confidence, top_k)
+    return results
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3 or len(sys.argv) > 4:
-        print("Usage: python yolo_ultralytics.py <input_path> <model_size> [show_image]")
+    if len(sys.argv) < 3 or len(sys.argv) > 5:
+        print("Usage: python yolo_ultralytics.py <input_path> <model_size> [show_image] [backend]")
         print("Model sizes: 'n', 's', 'm', 'l', 'x'")
         print("show_image: 'true' or 'false' (optional, default: false)")
+        print(f"backend: {', '.join(BACKENDS)} (optional, default: torch)")
         sys.exit(1)
     
     input_path = sys.argv[1]
     model_size = sys.argv[2]
-    show_image = len(sys.argv) == 4 and sys.argv[3].lower() == 'true'
+    show_image = len(sys.argv) >= 4 and sys.argv[3].lower() == 'true'
+    backend = sys.argv[4] if len(sys.argv) == 5 else 'torch'
     
-    result = detect_object(input_path, model_size, show_image=show_image)
-    print(result)
\ No newline at end of file
+    if show_image:
+        result = detect_object(input_path, model_size, show_image=True, backend=backend)
+    else:
+        from model_server import get_inference_client
+        result = get_inference_client().detect_object(input_path, model_size, backend=backend)
+    print(result)
@@ -0,0 +1,68 @@
+import os
+from pathlib import PurePosixPath
+
+# HEIC/HEIF originals are decoded with pillow-heif and optimized straight to JPEG
+HEIF_EXTENSIONS = {'.heic', '.heif'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif'} | HEIF_EXTENSIONS
+
+
+def optimized_relative_path(relative_path):
+    """Path of an original's optimized copy, relative to the optimized directory (HEIF becomes .jpg)"""
+    path = PurePosixPath(relative_path)
+    return path.with_suffix('.jpg') if path.suffix.lower() in HEIF_EXTENSIONS else path
+
+
+def converted_heifs(relative_paths):
+    """HEIF originals that already have a converted JPEG with the same name next to them"""
+    jpegs = {os.path.splitext(p)[0] for p in relative_paths if os.path.splitext(p)[1].lower() in ('.jpg', '.jpeg')}
+    return {p for p in relative_paths
+            if os.path.splitext(p)[1].lower() in HEIF_EXTENSIONS and os.path.splitext(p)[0] in jpegs}
+
+
+def scan_tree(root, extensions=IMAGE_EXTENSIONS, with_stat=False):
+    """
+    Walk root once with os.scandir.
+
+    Returns:
+        dict: {relative posix path: os.stat_result, or None unless with_stat} for every
+              file whose lower-cased suffix is in extensions
+    """
+    found = {}
+    stack = [('', str(root))]
+    while stack:
+        rel_dir, abs_dir = stack.pop()
+        try:
+            entries = os.scandir(abs_dir)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((rel_path + '/', entry.path))
+                elif os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                    found[rel_path] = entry.stat() if with_stat else None
+    return found
+
+
+def remove_files(root, relative_paths, dry_run=False):
+    """Unlink files under root, then remove directories they leave empty, deepest first"""
+    root = str(root)
+    parents = set()
+    for rel_path in relative_paths:
+        if not dry_run:
+            try:
+                os.unlink(os.path.join(root, rel_path))
+            except FileNotFoundError:
+                pass
+        parent = os.path.dirname(rel_path)
+        while parent:
+            parents.add(parent)
+            parent = os.path.dirname(parent)
+
+    if not dry_run:
+        for parent in sorted(parents, key=lambda p: p.count('/'), reverse=True):
+            try:
+                os.rmdir(os.path.join(root, parent))
+            except OSError:
+                pass  # Directory not empty, that's fine
@@ -0,0 +1,155 @@
+import hashlib
+import io
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from photo_files import HEIF_EXTENSIONS
+
+_heif_opener_registered = False
+
+
+def register_heif_opener_once():
+    """Teach Pillow to open HEIC/HEIF; pillow-heif is only imported once such a photo shows up"""
+    global _heif_opener_registered
+    if not _heif_opener_registered:
+        try:
+            import pillow_heif
+        except ImportError as e:
+            raise ImportError(f"{e}. HEIC/HEIF photos need pillow-heif: pip install pillow-heif") from e
+        pillow_heif.register_heif_opener()
+        _heif_opener_registered = True
+
+
+DRAFT_SCALES = (8, 4, 2, 1)
+
+
+def draft_scale(size, long_side=0, short_side=0):
+    """
+    Largest power-of-two reduction (8, 4, 2 or 1) of an image of `size` that keeps
+    its long side >= long_side and its short side >= short_side. JPEG decoders can
+    decode at these scales directly (DCT scaling), for a fraction of the time and
+    memory of a full decode.
+    """
+    width, height = size
+    for scale in DRAFT_SCALES:
+        if max(width, height) // scale >= long_side and min(width, height) // scale >= short_side:
+            return scale
+    return 1
+
+
+def estimate_decoded_bytes(path, long_side=0, short_side=0):
+    """
+    Bytes of the image PhotoFrame would decode for these request_size() arguments,
+    from the header alone (width * height * bands, reduced by the draft scale for
+    JPEGs). Returns 0 if the header can't be read; the decode will report that.
+    """
+    path = Path(path)
+    try:
+        # Inside the try: without pillow-heif a HEIC only fails later, in its own decode
+        if path.suffix.lower() in HEIF_EXTENSIONS:
+            register_heif_opener_once()
+        with Image.open(path) as img:
+            width, height = img.size
+            bands = len(img.getbands())
+            reduced = img.format == 'JPEG' and (long_side or short_side)
+            scale = draft_scale(img.size, long_side, short_side) if reduced else 1
+    except Exception:
+        return 0
+    return (width // scale) * (height // scale) * bands
+
+
+class PhotoFrame:
+    """
+    A photo read from disk once and decoded once, shared by every analyzer.
+
+    The file bytes are read up front (they also give the content hash), but pixels
+    are only decoded the first time an image view is requested, so a photo whose
+    results are all cached never pays for a decode.
+
+    Consumers that only need a smaller image call request_size() before the first
+    decode. A JPEG is then decoded at the largest power-of-two reduction that still
+    covers every request (PIL draft mode), instead of at full resolution.
+
+    Views:
+        image      - decoded PIL image with EXIF orientation applied, original mode
+        rgb_image  - the same image as RGB (alpha dropped, like Image.convert('RGB'))
+        rgb        - read-only HxWx3 uint8 NumPy array of rgb_image
+        exif       - EXIF of the original file (orientation tag intact)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        if self.path.suffix.lower() in HEIF_EXTENSIONS:
+            register_heif_opener_once()
+        self.data = self.path.read_bytes()
+        self._content_hash = None
+        self._image = None
+        self._exif = None
+        self._rgb_image = None
+        self._rgb = None
+        self._min_long_side = 0
+        self._min_short_side = 0
+        self._full_resolution = False
+        self.decode_scale = None  # Set by the decode: 1 for full resolution, 2/4/8 when reduced
+
+    def request_size(self, long_side=0, short_side=0):
+        """
+        Declare the smallest image a consumer needs, before the first decode.
+        long_side/short_side=None means full resolution. Requests are combined,
+        so the decode covers the largest one.
+        """
+        if self._image is not None:
+            raise RuntimeError("request_size() must be called before the image is decoded")
+        if long_side is None or short_side is None:
+            self._full_resolution = True
+        else:
+            self._min_long_side = max(self._min_long_side, long_side)
+            self._min_short_side = max(self._min_short_side, short_side)
+
+    @property
+    def content_hash(self):
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.data).hexdigest()
+        return self._content_hash
+
+    def _decode(self):
+        with Image.open(io.BytesIO(self.data)) as img:
+            self._exif = img.getexif()
+            self.decode_scale = 1
+            if not self._full_resolution and (self._min_long_side or self._min_short_side):
+                scale = draft_scale(img.size, self._min_long_side, self._min_short_side)
+                # draft() only applies to JPEG; other formats decode at full size
+                if scale > 1 and img.draft(img.mode, (img.width // scale, img.height // scale)) is not None:
+                    self.decode_scale = scale
+            # exif_transpose returns a loaded copy, so the source can be closed
+            self._image = ImageOps.exif_transpose(img)
+
+    @property
+    def image(self):
+        if self._image is None:
+            self._decode()
+        return self._image
+
+    @property
+    def exif(self):
+        if self._exif is None:
+            # Reading EXIF only needs the header, not a pixel decode
+            with Image.open(io.BytesIO(self.data)) as img:
+                self._exif = img.getexif()
+        return self._exif
+
+    @property
+    def rgb_image(self):
+        if self._rgb_image is None:
+            image = self.image
+            self._rgb_image = image if image.mode == 'RGB' else image.convert('RGB')
+        return self._rgb_image
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            # numpy is only needed by the analyzers, so an optimize-only run never imports it
+            import numpy as np
+            self._rgb = np.asarray(self.rgb_image)
+        return self._rgb
@@ -0,0 +1,156 @@
+import json
+import os
+from pathlib import Path
+
+from analysis_cache import hash_file, make_params_key
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST_PATH = Path(".photo_cache/manifest.json")
+MANIFEST_VERSION = 1
+
+
+class ManifestDiff:
+    """Result of PhotoManifest.diff(); every list holds relative posix paths"""
+
+    def __init__(self):
+        self.new = []
+        self.modified = []
+        self.stale = []  # Unchanged file, but an output is missing or an analyzer has not run with these params
+        self.deleted = []
+        self.unchanged = 0
+
+    @property
+    def scheduled(self):
+        return sorted(self.new + self.modified + self.stale)
+
+    def __bool__(self):
+        return bool(self.new or self.modified or self.stale or self.deleted)
+
+    def summary(self):
+        return (f"{len(self.new)} new, {len(self.modified)} modified, {len(self.stale)} stale, "
+                f"{len(self.deleted)} deleted, {self.unchanged} unchanged")
+
+
+class PhotoManifest:
+    """
+    What the last runs produced for each original photo, keyed by relative path.
+
+    Each entry records the file's size, mtime_ns and content hash, and its outputs:
+    the optimized file, the photos.md title, and the parameters each analyzer ran
+    with. diff() compares a scan_tree(..., with_stat=True) result against it by
+    stat alone; a file is only hashed when its stat changed, so a touched but
+    identical file is not re-processed.
+
+    The stat of photos.md is recorded as well, so a hand-edited or missing
+    photos.md is noticed without parsing it.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self.entries = {}
+        self.photos_md_stat = None
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != MANIFEST_VERSION:
+                logger.info(f"Ignoring {self.path}: version {data.get('version')} != {MANIFEST_VERSION}")
+                return
+            self.entries = data.get('entries', {})
+            self.photos_md_stat = data.get('photos_md')
+        except Exception as e:
+            logger.info(f"Could not load manifest {self.path}: {e}")
+
+    def diff(self, root, scanned, analyzer_params=None, optimized=None):
+        """
+        Compare a scan of the originals against the manifest.
+
+        Args:
+            root: the originals directory that was scanned
+            scanned: {relative path: os.stat_result} from scan_tree(..., with_stat=True)
+            analyzer_params: {analyzer name: params} requested for this run
+            optimized: set of relative paths present in the optimized directory
+        """
+        wanted = {name: make_params_key(params) for name, params in (analyzer_params or {}).items()}
+        diff = ManifestDiff()
+        for rel_path, stat in scanned.items():
+            entry = self.entries.get(rel_path)
+            if entry is None:
+                diff.new.append(rel_path)
+                continue
+            if (entry['size'], entry['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+                content_hash = hash_file(os.path.join(root, rel_path)) if entry.get('hash') else None
+                if content_hash is None or content_hash != entry['hash']:
+                    diff.modified.append(rel_path)
+                    continue
+                # Touched, same bytes: refresh the stat and keep the outputs
+                entry['size'], entry['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+                self.dirty = True
+            outputs = entry.get('outputs', {})
+            done = outputs.get('analyzers', {})
+            if ((optimized is not None and outputs.get('optimized') not in optimized)
+                    or any(done.get(name) != key for name, key in wanted.items())):
+                diff.stale.append(rel_path)
+            else:
+                diff.unchanged += 1
+        diff.deleted = sorted(self.entries.keys() - scanned.keys())
+        return diff
+
+    def record(self, rel_path, stat, content_hash, optimized, title, analyzer_params):
+        """Record a processed photo; analyzer_params maps each analyzer that ran to its params"""
+        previous = self.entries.get(rel_path, {}).get('outputs', {}).get('analyzers', {})
+        analyzers = dict(previous)
+        analyzers.update({name: make_params_key(params) for name, params in analyzer_params.items()})
+        self.entries[rel_path] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': content_hash,
+            'outputs': {'optimized': optimized, 'title': title, 'analyzers': analyzers},
+        }
+        self.dirty = True
+
+    def forget(self, rel_paths):
+        """Drop entries and return the photos.md titles they produced"""
+        titles = []
+        for rel_path in rel_paths:
+            entry = self.entries.pop(rel_path, None)
+            if entry is not None:
+                titles.append(entry.get('outputs', {}).get('title'))
+                self.dirty = True
+        return titles
+
+    def titles(self):
+        return {entry.get('outputs', {}).get('title') for entry in self.entries.values()}
+
+    def photos_md_changed(self, photos_md_path):
+        """True if photos.md is not the file this manifest last saw written"""
+        try:
+            stat = os.stat(photos_md_path)
+        except FileNotFoundError:
+            return True
+        return self.photos_md_stat != [stat.st_size, stat.st_mtime_ns]
+
+    def save(self, photos_md_path=None):
+        """Write the manifest atomically, remembering the current stat of photos.md"""
+        if photos_md_path is not None and os.path.exists(photos_md_path):
+            stat = os.stat(photos_md_path)
+            if self.photos_md_stat != [stat.st_size, stat.st_mtime_ns]:
+                self.photos_md_stat = [stat.st_size, stat.st_mtime_ns]
+                self.dirty = True
+        if not self.dirty:
+            return False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'photos_md': self.photos_md_stat, 'entries': self.entries},
+                      f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        return True
@@ -0,0 +1,81 @@
+import threading
+from queue import Queue, Empty
+
+import logging
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Stage:
+    """
+    One step of a streaming pipeline: a pool of worker threads reading a bounded queue.
+
+    put() blocks while the queue is full, so a slow stage applies back-pressure to
+    the stages feeding it and the number of photos in flight stays bounded. With
+    batch_size > 1 each worker drains up to batch_size queued items and hands them
+    to the handler as one list (for batched model inference).
+
+    Stages are closed in pipeline order: close() lets the workers finish what is
+    already queued and joins them, after which nothing more is sent downstream.
+    """
+
+    def __init__(self, name, handler, workers=1, maxsize=None, batch_size=1, on_error=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.queue = Queue(maxsize=maxsize or max(2, 2 * workers * batch_size))
+        self.processed = 0
+        self._count_lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}_{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def close(self):
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _next_batch(self):
+        item = self.queue.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except Empty:
+                break
+            if item is _STOP:
+                # Leave the stop signal for the next get(), after this batch
+                self.queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self.handler(batch if self.batch_size > 1 else batch[0])
+            except Exception as e:
+                logger.error(f"[{threading.current_thread().name}] {self.name} stage failed: {e}")
+                if self.on_error is not None:
+                    for item in batch:
+                        self.on_error(item, e)
+            with self._count_lock:
+                self.processed += len(batch)
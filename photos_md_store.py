@@ -0,0 +1,96 @@
+import os
+import threading
+from pathlib import Path
+
+import yaml
+
+import logging
+logger = logging.getLogger(__name__)
+
+# LibYAML's C loader/dumper are much faster on a photos.md with thousands of items
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
+
+DEFAULT_FRONT_MATTER = {
+    'layout': 'photos',
+    'title': 'Life',
+    'slug': '/photos',
+}
+
+
+class PhotosMdStore:
+    """
+    In-memory index of the photos.md front matter items, keyed by title.
+
+    photos.md is parsed once. Merging an item is an O(1) dict update that keeps
+    the existing order (new titles are appended), and the file is only rewritten
+    by save(), atomically, at checkpoints and at the end of a run.
+    """
+
+    def __init__(self, path='photos.md'):
+        self.path = Path(path)
+        self.front_matter = dict(DEFAULT_FRONT_MATTER)
+        self.body = ""
+        self.items = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            content = self.path.read_text(encoding='utf-8')
+            # Extract YAML front matter
+            if content.startswith('---'):
+                yaml_end = content.find('---', 3)
+                if yaml_end != -1:
+                    existing_data = yaml.load(content[3:yaml_end], Loader=YamlLoader) or {}
+                    self.body = content[yaml_end + 3:].lstrip('\n')
+                    for item in existing_data.pop('items', None) or []:
+                        self.items[item.get('title', '')] = item
+                    self.front_matter.update(existing_data)
+                    logger.info(f"Loaded {len(self.items)} existing items from {self.path}")
+        except Exception as e:
+            logger.info(f"Could not load existing {self.path}: {e}")
+
+    def get(self, title, default=None):
+        return self.items.get(title, default)
+
+    def merge(self, items_batch):
+        """Add new items and replace existing ones with the same title"""
+        with self._lock:
+            for item in items_batch:
+                self.items[item['title']] = item
+            if items_batch:
+                self.dirty = True
+
+    def remove(self, titles):
+        with self._lock:
+            for title in titles:
+                if self.items.pop(title, None) is not None:
+                    self.dirty = True
+
+    def save(self, force=False):
+        """Write photos.md via a temp file and rename, so readers never see a partial file"""
+        with self._lock:
+            if not (self.dirty or force):
+                return False
+            front_matter = dict(self.front_matter)
+            front_matter['items'] = list(self.items.values())
+
+            content = "---\n"
+            content += yaml.dump(front_matter, Dumper=YamlDumper, allow_unicode=True, default_flow_style=False)
+            content += "---\n"
+            if self.body:
+                content += self.body
+
+            tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+            logger.info(f"Saved {len(self.items)} items to {self.path}")
+            return True
@@ -1,6 +1,10 @@
 import os
 import sys
 import time
+import hashlib
+import json
+import threading
+from queue import Queue
 import torch
 import clip
 from PIL import Image
@@ -13,6 +17,10 @@ logger = logging.getLogger(__name__)
 
 _clip_model = None
 _clip_processor = None
+_analyzer = None
+
+TEXT_PROMPT_TEMPLATE = "this image feels {}"
+TEXT_EMBEDDING_CACHE_DIR = Path(".photo_cache/clip_text_embeddings")
 
 def load_clip_model_once():
     """Load CLIP model only once and store globally"""
@@ -25,12 +33,23 @@ def load_clip_model_once():
     
     return _clip_model, _clip_processor
 
+def get_sentiment_analyzer():
+    """Create the analyzer only once, so its text embeddings are reused across images"""
+    global _analyzer
+    
+    if _analyzer is None:
+        _analyzer = CLIPSentimentAnalyzer()
+    
+    return _analyzer
+
 class CLIPSentimentAnalyzer:
     def __init__(self, model_name="ViT-B/32"):
         """Initialize CLIP model for sentiment analysis"""
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         
+        self.model_name = model_name
         self.model, self.preprocess = load_clip_model_once()
+        self._text_embeddings = None
         # self.model, self.preprocess = clip.load(model_name, device=self.device)
         
         # For open-ended sentiment analysis
@@ -106,11 +125,140 @@ class CLIPSentimentAnalyzer:
             self.text_embeddings = self.model.encode_text(text_tokens)
             self.text_embeddings = self.text_embeddings / self.text_embeddings.norm(dim=-1, keepdim=True)
     
-    def analyze_sentiment(self, image_path, top_k, confidence_threshold):
-        """Analyze sentiment of an image using CLIP"""
+    def _encode_text_bank(self):
+        """Encode every "this image feels {adj}" prompt; returns normalized (num_adjectives, dim) embeddings"""
+        text_queries = [TEXT_PROMPT_TEMPLATE.format(adj) for adj in self.sentiment_adjectives]
+        text_tokens = clip.tokenize(text_queries).to(self.device)
+        
+        with torch.no_grad():
+            text_embeddings = self.model.encode_text(text_tokens)
+            text_embeddings = text_embeddings / text_embeddings.norm(dim=-1, keepdim=True)
+        return text_embeddings
+    
+    def _text_bank_path(self):
+        """Cache file for the current model, adjective list and prompt template"""
+        key = json.dumps([self.model_name, TEXT_PROMPT_TEMPLATE, self.sentiment_adjectives])
+        return TEXT_EMBEDDING_CACHE_DIR / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]}.npy"
+    
+    def get_text_embeddings(self):
+        """
+        Text embeddings for the adjective prompts, computed at most once.
+        
+        Memoized on the analyzer and persisted as .npy, so a cold process memory-maps
+        the matrix instead of running the text tower at all.
+        """
+        if self._text_embeddings is not None:
+            return self._text_embeddings
+        
+        cache_path = self._text_bank_path()
+        if cache_path.exists():
+            try:
+                # Copy-on-write mapping gives torch a writable array without reading it eagerly
+                bank = np.load(cache_path, mmap_mode='c')
+                if bank.shape[0] == len(self.sentiment_adjectives):
+                    self._text_embeddings = torch.from_numpy(bank).to(self.device)
+                    logger.info(f"Loaded CLIP text embeddings from {cache_path}")
+                    return self._text_embeddings
+            except Exception as e:
+                logger.warning(f"Could not load CLIP text embeddings from {cache_path}: {e}")
+        
+        text_embeddings = self._encode_text_bank()
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, text_embeddings.float().cpu().numpy())
+            os.replace(tmp_path, cache_path)
+            logger.info(f"Saved CLIP text embeddings to {cache_path}")
+        except OSError as e:
+            logger.warning(f"Could not save CLIP text embeddings to {cache_path}: {e}")
+        
+        self._text_embeddings = text_embeddings
+        return self._text_embeddings
+    
+    def _rank_sentiments(self, similarities, top_k, confidence_threshold):
+        """Top-k adjectives above the threshold for one row of image-text similarities"""
+        order = np.argsort(-similarities, kind='stable')[:top_k]
+        filtered_sentiments = [(self.sentiment_adjectives[j], similarities[j]) for j in order
+                               if similarities[j] >= confidence_threshold]
+        return filtered_sentiments if filtered_sentiments else [('uncertain', 0.0)]
+    
+    def _prefetch_batches(self, image_paths, images, batch_size):
+        """
+        Yield (indices, tensors) batches of preprocessed images.
+        
+        Decoding and preprocessing run in a background thread, up to two batches
+        ahead, so they overlap with encode_image on the previous batch. Images that
+        fail to load are logged and left out of the batch.
+        """
+        batches = Queue(maxsize=2)
+        
+        def producer():
+            indices, tensors = [], []
+            for i, image_path in enumerate(image_paths):
+                try:
+                    image = images[i] if images is not None else None
+                    if image is None:
+                        image = Image.open(image_path).convert('RGB')
+                    tensors.append(self.preprocess(image))
+                    indices.append(i)
+                except Exception as e:
+                    logger.error(f"Error loading {image_path}: {e}")
+                if len(tensors) == batch_size:
+                    batches.put((indices, tensors))
+                    indices, tensors = [], []
+            if tensors:
+                batches.put((indices, tensors))
+            batches.put(None)
+        
+        threading.Thread(target=producer, name="CLIPPrefetch", daemon=True).start()
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            yield batch
+    
+    def analyze_sentiment_batch(self, image_paths, top_k, confidence_threshold, batch_size=16, images=None):
+        """
+        Analyze sentiment of many images, batch_size images per encode_image call.
+        
+        Args:
+            image_paths (list): Image paths
+            images (list): Optional already decoded RGB PIL images, parallel to image_paths
+        
+        Returns:
+            list: One result per input, in input order, shaped like analyze_sentiment's,
+                  or None for an image that could not be loaded or analyzed
+        """
+        results = [None for _ in image_paths]
+        if not image_paths:
+            return results
+        
+        text_embeddings = self.get_text_embeddings()
+        
+        for indices, tensors in self._prefetch_batches(image_paths, images, batch_size):
+            try:
+                image_input = torch.stack(tensors).to(self.device)
+                with torch.no_grad():
+                    image_embeddings = self.model.encode_image(image_input)
+                    image_embeddings = image_embeddings / image_embeddings.norm(dim=-1, keepdim=True)
+                
+                # One (batch, num_adjectives) matrix multiply scores the whole batch
+                similarities = torch.matmul(image_embeddings, text_embeddings.T.to(image_embeddings.dtype)).float().cpu().numpy()
+                for row, i in enumerate(indices):
+                    results[i] = self._rank_sentiments(similarities[row], top_k, confidence_threshold)
+            except Exception as e:
+                logger.error(f"Error analyzing sentiment for batch starting at {image_paths[indices[0]]}: {e}")
+        
+        return results
+    
+    def analyze_sentiment(self, image_path, top_k, confidence_threshold, image=None):
+        """Analyze sentiment of an image using CLIP. Pass an already decoded RGB PIL image to skip reading image_path.
+        Errors are logged and raised, so callers can tell a failure from an uncertain result"""
         try:
             # Load and preprocess image
-            image = Image.open(image_path).convert('RGB')
+            if image is None:
+                image = Image.open(image_path).convert('RGB')
             image_input = self.preprocess(image).unsqueeze(0).to(self.device)
             
             # Get image embedding
@@ -119,32 +267,21 @@ class CLIPSentimentAnalyzer:
                 image_embedding = image_embedding / image_embedding.norm(dim=-1, keepdim=True)
         
             # Open-ended sentiment analysis
-            text_queries = [f"this image feels {adj}" for adj in self.sentiment_adjectives]
-            text_tokens = clip.tokenize(text_queries).to(self.device)
-            
-            with torch.no_grad():
-                text_embeddings = self.model.encode_text(text_tokens)
-                text_embeddings = text_embeddings / text_embeddings.norm(dim=-1, keepdim=True)
+            text_embeddings = self.get_text_embeddings()
             
             # Calculate similarities
-            similarities = torch.matmul(image_embedding, text_embeddings.T)
-            similarities = similarities.cpu().numpy()[0]
-            
-            # Create sentiment-score pairs and filter by threshold
-            sentiment_scores = list(zip(self.sentiment_adjectives, similarities))
-            sorted_sentiments = sorted(sentiment_scores, key=lambda x: x[1], reverse=True)
-            filtered_sentiments = [(sentiment, score) for sentiment, score in sorted_sentiments 
-                                    if score >= confidence_threshold]
+            similarities = torch.matmul(image_embedding, text_embeddings.T.to(image_embedding.dtype))
+            similarities = similarities.float().cpu().numpy()[0]
             
-            return filtered_sentiments[:top_k] if filtered_sentiments else [('uncertain', 0.0)]
+            return self._rank_sentiments(similarities, top_k, confidence_threshold)
             
         except Exception as e:
             logger.error(f"Error analyzing sentiment for {image_path}: {e}")
-            return [('unknown', 0.0)]
+            raise
 
 def generate_sentiment_with_clip(image_path, confidence_threshold):
     """Generate sentiment using CLIP model"""
-    analyzer = CLIPSentimentAnalyzer()
+    analyzer = get_sentiment_analyzer()
     sentiments = analyzer.analyze_sentiment(image_path, top_k=1, confidence_threshold=confidence_threshold)
     
     # Get the top sentiment
@@ -153,20 +290,20 @@ def generate_sentiment_with_clip(image_path, confidence_threshold):
     logger.info(f"Sentiment: {top_sentiment} (confidence: {confidence:.3f})")
     return top_sentiment, confidence
 
-def analyze_single_image(image_path, confidence_threshold):
+def analyze_single_image(image_path, confidence_threshold, image=None):
     """Analyze sentiment for a single image"""
     image_path = Path(image_path)
     
-    if not image_path.exists():
+    if image is None and not image_path.exists():
         logger.error(f"Image {image_path} does not exist")
         return None
     
-    # Initialize analyzer
-    analyzer = CLIPSentimentAnalyzer()
+    # Reuse one analyzer (and its text embeddings) across calls
+    analyzer = get_sentiment_analyzer()
     
     logger.info(f"Analyzing image: {image_path.name}")
     
-    sentiments = analyzer.analyze_sentiment(image_path, top_k=3, confidence_threshold=confidence_threshold)
+    sentiments = analyzer.analyze_sentiment(image_path, top_k=3, confidence_threshold=confidence_threshold, image=image)
     
     if not sentiments or sentiments[0][0] in ['uncertain', 'unknown']:
         logger.warning(f"No confident sentiment found (threshold: {confidence_threshold})")
@@ -184,44 +321,43 @@ def analyze_single_image(image_path, confidence_threshold):
     print(f"sentiments_list: {sentiments_list}")
     return sentiments_list
 
-def analyze_image_batch(photos_dir, output_file, confidence_threshold):
-    """Analyze sentiment for all images in a directory"""
+def analyze_image_batch(photos_dir, output_file, confidence_threshold, batch_size=16):
+    """Analyze sentiment for all images in a directory, on the model server if one is running"""
+    from model_server import get_inference_client
     photos_dir = Path(photos_dir)
     image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.PNG'}
     
-    # Initialize analyzer once for batch processing
-    analyzer = CLIPSentimentAnalyzer()
-    
     results = []
-    total_files = len([f for f in photos_dir.iterdir() if f.suffix.lower() in image_extensions])
-    logger.info(f"Found {total_files} images to analyze with confidence threshold: {confidence_threshold}")
+    # Absolute paths, since the model server may run from another directory
+    image_files = [f.resolve() for f in photos_dir.iterdir() if f.suffix.lower() in image_extensions]
+    total_files = len(image_files)
+    logger.info(f"Found {total_files} images to analyze with confidence threshold: {confidence_threshold} (batch size {batch_size})")
     
-    processed = 0
     uncertain_count = 0
     
-    for image_file in photos_dir.iterdir():
-        if image_file.suffix.lower() in image_extensions:
-            processed += 1
-            logger.info(f"Processing {processed}/{total_files}: {image_file.name}")
-            
-            sentiments = analyzer.analyze_sentiment(image_file, top_k=3, confidence_threshold=confidence_threshold)
-            
-            if not sentiments or sentiments[0][0] in ['uncertain', 'unknown']:
-                logger.warning(f"  → No confident sentiment (threshold: {confidence_threshold})")
-                uncertain_count += 1
-                continue
-            
-            top_sentiment, confidence = sentiments[0]
-            
-            result = {
-                'filename': image_file.name,
-                'sentiment': top_sentiment,
-                'confidence': confidence,
-                'all_sentiments': sentiments
-            }
-            results.append(result)
-            
-            logger.info(f"  → {top_sentiment} ({confidence:.3f})")
+    all_sentiments = get_inference_client().analyze_sentiment_batch(image_files, confidence_threshold,
+                                                                    batch_size=batch_size, with_scores=True)
+    
+    for processed, (image_file, sentiments) in enumerate(zip(image_files, all_sentiments), 1):
+        logger.info(f"Processed {processed}/{total_files}: {image_file.name}")
+        
+        # None if the image could not be analyzed, [] if nothing is above the threshold
+        if not sentiments:
+            logger.warning(f"  → No confident sentiment (threshold: {confidence_threshold})")
+            uncertain_count += 1
+            continue
+        
+        top_sentiment, confidence = sentiments[0]
+        
+        result = {
+            'filename': image_file.name,
+            'sentiment': top_sentiment,
+            'confidence': confidence,
+            'all_sentiments': sentiments
+        }
+        results.append(result)
+        
+        logger.info(f"  → {top_sentiment} ({confidence:.3f})")
     
     logger.info(f"Analysis complete: {len(results)} confident results, {uncertain_count} uncertain (below threshold)")
     
@@ -252,6 +388,7 @@ if __name__ == "__main__":
         print("  --open-ended              Use open-ended sentiment analysis")
         print("  --threshold <value>       Set confidence threshold (default: 0.25)")
         print("  --output <file>           Set output file for batch analysis")
+        print("  --batch-size <n>          Images per CLIP forward pass for directories (default: 16)")
         print("\nExamples:")
         print("  python clip_sentiment.py photo.jpg")
         print("  python clip_sentiment.py photo.jpg --open-ended --threshold 0.4")
@@ -261,6 +398,7 @@ if __name__ == "__main__":
     input_path = sys.argv[1]
     output_file = "sentiment_results.txt"
     confidence_threshold = 0.2
+    batch_size = 16
     
     # Parse arguments
     i = 2
@@ -280,6 +418,13 @@ if __name__ == "__main__":
             else:
                 print("Error: --output requires a filename")
                 sys.exit(1)
+        elif arg == "--batch-size":
+            if i + 1 < len(sys.argv):
+                batch_size = int(sys.argv[i + 1])
+                i += 1
+            else:
+                print("Error: --batch-size requires a value")
+                sys.exit(1)
         i += 1
     
     if not os.path.exists(input_path):
@@ -292,11 +437,12 @@ if __name__ == "__main__":
         # Single image analysis
         logger.info(f"Starting CLIP sentiment analysis on single image (threshold: {confidence_threshold})")
         ts = time.time()
-        sentiments_list = analyze_single_image(input_path, confidence_threshold)
+        from model_server import get_inference_client
+        sentiments_list = get_inference_client().analyze_sentiment(input_path, confidence_threshold)
         if sentiments_list:
             logger.info(f"Analysis complete! (inference time: {time.time() - ts:.2f}s)")
     else:
         # Directory analysis
         logger.info(f"Starting CLIP sentiment analysis on {input_path} (threshold: {confidence_threshold})")
-        results = analyze_image_batch(input_path, output_file, confidence_threshold)
+        results = analyze_image_batch(input_path, output_file, confidence_threshold, batch_size)
         logger.info(f"Analysis complete! {len(results)} confident results found")
\ No newline at end of file